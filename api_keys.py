@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+API_KEY_CACHE_TTL = float(os.getenv('API_KEY_CACHE_TTL', '60'))
+API_KEY_CACHE_NEGATIVE_TTL = float(os.getenv('API_KEY_CACHE_NEGATIVE_TTL', '10'))
+API_KEY_CACHE_SIZE = int(os.getenv('API_KEY_CACHE_SIZE', '10000'))
+
+
+class ApiKeyCache:
+    """In-process TTL/LRU cache of API key records
+
+    Unknown keys are cached too (for a shorter TTL) so bad keys don't hit the
+    table on every request. Usage recorded by this process is counted locally
+    on top of the cached record, and the count is reconciled with the table
+    whenever the entry expires and is reloaded.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], Optional[Dict[str, Any]]],
+        ttl: float = API_KEY_CACHE_TTL,
+        negative_ttl: float = API_KEY_CACHE_NEGATIVE_TTL,
+        maxsize: int = API_KEY_CACHE_SIZE,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.loader = loader
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        # api_key -> (expires_at, record or None, local usage not yet reflected in record)
+        self._entries: "OrderedDict[str, Tuple[float, Optional[Dict[str, Any]], int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, api_key: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Return (hit, record) from the cache alone; record is None for a known-invalid key"""
+        with self._lock:
+            entry = self._entries.get(api_key)
+            if entry is None or entry[0] <= self.clock():
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(api_key)
+            self.hits += 1
+            return True, self._view(entry)
+
+    def load(self, api_key: str) -> Optional[Dict[str, Any]]:
+        """Read a key through the loader and cache the result, including a miss"""
+        record = self.loader(api_key)
+        ttl = self.ttl if record is not None else self.negative_ttl
+        entry = (self.clock() + ttl, record, 0)
+        with self._lock:
+            self._entries[api_key] = entry
+            self._entries.move_to_end(api_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return self._view(entry)
+
+    def get(self, api_key: str) -> Optional[Dict[str, Any]]:
+        hit, record = self.lookup(api_key)
+        if hit:
+            return record
+        return self.load(api_key)
+
+    def add_usage(self, api_key: str, units: int = 1):
+        """Count usage recorded by this process against the cached record"""
+        with self._lock:
+            entry = self._entries.get(api_key)
+            if entry is not None and entry[1] is not None:
+                expires_at, record, local_usage = entry
+                self._entries[api_key] = (expires_at, record, local_usage + units)
+
+    def invalidate(self, api_key: str):
+        with self._lock:
+            self._entries.pop(api_key, None)
+
+    def invalidate_user(self, user_id: str):
+        """Drop every cached key that belongs to a user, e.g. after a plan change"""
+        with self._lock:
+            stale = [
+                api_key for api_key, (_, record, _) in self._entries.items()
+                if record is not None and record.get('user_id') == user_id
+            ]
+            for api_key in stale:
+                self._entries.pop(api_key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def _view(entry) -> Optional[Dict[str, Any]]:
+        _, record, local_usage = entry
+        if record is None:
+            return None
+        if not local_usage:
+            return record
+        return {**record, 'usage': record.get('usage', 0) + local_usage}
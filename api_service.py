@@ -1,101 +1,563 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Header
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import boto3
-from datetime import datetime
 import uuid
 import json
+import io
+import asyncio
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from contextlib import AsyncExitStack, asynccontextmanager
 from unstructured.partition.auto import partition
 from unstructured.chunking.title import chunk_by_title
-from unstructured.staging.base import convert_to_isd
+from unstructured.staging.base import convert_to_isd, dict_to_elements
 import stripe
 import os
 
+import billing
+from api_keys import ApiKeyCache
+from parallel_partition import partition_page_range, split_pdf_into_ranges
+from jobs import JOB_COMPLETED, JOB_FAILED, InMemoryJobBackend, Job, JobQueue, QueueFullError
+
 app = FastAPI(title="AI-Ready Data API", version="1.0.0")
 
 # Initialize services
-dynamodb = boto3.resource('dynamodb')
 s3_client = boto3.client('s3')
-usage_table = dynamodb.Table(os.getenv('USAGE_TABLE', 'api-usage'))
+# Same table, and DynamoDB endpoint, that billing's usage meter writes to
+usage_table = billing.usage_table
 stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
 
+# Partitioning is CPU-bound, so it runs in worker processes instead of on the event loop
+PARTITION_WORKERS = int(os.getenv('PARTITION_WORKERS', str(os.cpu_count() or 1)))
+MAX_IN_FLIGHT_JOBS = int(os.getenv('MAX_IN_FLIGHT_JOBS', str(max(PARTITION_WORKERS, 1))))
+MAX_QUEUED_JOBS = int(os.getenv('MAX_QUEUED_JOBS', str(MAX_IN_FLIGHT_JOBS * 4)))
+
+# PARTITION_WORKERS=0 falls back to the default thread pool where multiprocessing is unavailable
+partition_pool = ProcessPoolExecutor(max_workers=PARTITION_WORKERS) if PARTITION_WORKERS > 0 else None
+
+class AdmissionController:
+    """Bound concurrent partition jobs and reject new ones once the wait queue is full"""
+    
+    def __init__(self, max_in_flight: int, max_queued: int):
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.max_pending = max_in_flight + max_queued
+        self.pending = 0
+    
+    @property
+    def saturated(self) -> bool:
+        return self.pending >= self.max_pending
+    
+    @asynccontextmanager
+    async def slot(self, wait: bool = False):
+        """Hold an in-flight slot; with wait, queue even when saturated instead of rejecting"""
+        if self.saturated and not wait:
+            raise HTTPException(
+                status_code=503,
+                detail="Server is at capacity, please retry shortly",
+                headers={"Retry-After": "5"}
+            )
+        self.pending += 1
+        try:
+            async with self._semaphore:
+                yield
+        finally:
+            self.pending -= 1
+
+admission = AdmissionController(MAX_IN_FLIGHT_JOBS, MAX_QUEUED_JOBS)
+
+JOB_RESULT_TTL_SECONDS = int(os.getenv('JOB_RESULT_TTL_SECONDS', '3600'))
+MAX_BATCH_FILES = int(os.getenv('MAX_BATCH_FILES', '1000'))
+# Uncompressed size limits, checked against zip headers before any member is decompressed
+MAX_BATCH_FILE_BYTES = int(os.getenv('MAX_BATCH_FILE_MB', '50')) * 1024 * 1024
+MAX_BATCH_TOTAL_BYTES = int(os.getenv('MAX_BATCH_TOTAL_MB', '500')) * 1024 * 1024
+# Documents of one batch partitioned at once, so single requests are not starved behind it
+BATCH_CONCURRENCY = max(PARTITION_WORKERS, 1)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_PAGES_PER_RANGE = int(os.getenv('STREAM_PAGES_PER_RANGE', '5'))
+
 class ProcessRequest(BaseModel):
     output_format: str = "json"  # json, embeddings, chunks
     chunk_strategy: Optional[str] = "by_title"
     max_chunk_size: Optional[int] = 500
     include_metadata: bool = True
+    mode: str = "sync"  # sync, async
+
+def load_api_key(api_key: str):
+    """Read an API key record from the usage table, plus usage not flushed to it yet"""
+    response = usage_table.get_item(Key={'api_key': api_key})
+    item = response.get('Item')
+    pending = billing.usage_meter.pending(api_key)
+    if item is not None and pending:
+        item['usage'] = item.get('usage', 0) + pending
+    return item
+
+api_key_cache = ApiKeyCache(load_api_key)
+billing.on_plan_change(api_key_cache.invalidate_user)
 
 async def verify_api_key(x_api_key: str = Header(...)):
     """Verify API key and check usage limits"""
     try:
-        response = usage_table.get_item(Key={'api_key': x_api_key})
-        if 'Item' not in response:
-            raise HTTPException(status_code=401, detail="Invalid API key")
-        
-        user = response['Item']
-        if user.get('usage', 0) >= user.get('limit', 1000):
-            raise HTTPException(status_code=429, detail="Usage limit exceeded")
-        
-        return user
+        # Cache hits are answered without leaving the event loop
+        hit, user = api_key_cache.lookup(x_api_key)
+        if not hit:
+            user = await run_in_threadpool(api_key_cache.load, x_api_key)
     except Exception as e:
         raise HTTPException(status_code=401, detail="Authentication failed")
+    
+    if user is None:
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    if user.get('usage', 0) >= user.get('limit', 1000):
+        raise HTTPException(status_code=429, detail="Usage limit exceeded")
+    
+    return user
+
+def format_result(elements, output_format: str, chunk_strategy: Optional[str], max_chunk_size: Optional[int]):
+    """Chunk partitioned elements and convert them to the requested output format"""
+    # Apply chunking
+    if chunk_strategy == "by_title":
+        chunks = chunk_by_title(elements, max_characters=max_chunk_size)
+    else:
+        chunks = elements
+    
+    # Convert to structured format
+    if output_format == "json":
+        return convert_to_isd(chunks)
+    elif output_format == "chunks":
+        return [{"text": str(c), "metadata": c.metadata.to_dict()} for c in chunks]
+    else:
+        return [{"text": str(e)} for e in elements]
+
+def partition_document(content: bytes, filename: str, output_format: str, chunk_strategy: Optional[str], max_chunk_size: Optional[int]):
+    """Partition, chunk and format a document; runs in the partition process pool"""
+    # Process with unstructured straight from the uploaded bytes
+    elements = partition(file=io.BytesIO(content), metadata_filename=filename)
+    return format_result(elements, output_format, chunk_strategy, max_chunk_size)
+
+def format_element_dicts(element_dicts: List[Dict[str, Any]], output_format: str, chunk_strategy: Optional[str], max_chunk_size: Optional[int]):
+    """Chunk and format elements partitioned elsewhere; runs in the partition process pool"""
+    return format_result(dict_to_elements(element_dicts), output_format, chunk_strategy, max_chunk_size)
+
+def split_pdf_for_streaming(content: bytes):
+    """Split a PDF into page ranges for streaming, or None when it is a single range
+
+    PDFs that can't be split (encrypted, malformed) also return None, so they go
+    through the single partition_document path, which unstructured may still read.
+    """
+    try:
+        parts = split_pdf_into_ranges(content, STREAM_PAGES_PER_RANGE)
+    except Exception:
+        return None
+    return parts if len(parts) > 1 else None
+
+async def iter_result_items(content: bytes, filename: str, request: ProcessRequest):
+    """Yield formatted result items as page ranges finish partitioning
+
+    PDFs are partitioned in page ranges across the process pool and emitted in
+    order as each range completes. Only PARTITION_WORKERS ranges are in flight
+    at once; the next range is submitted as each one is emitted, so a slow
+    reader holds back partitioning instead of piling results up in memory.
+    With title chunking, elements from the last title of a range onwards are
+    carried into the next range so sections are not cut at range boundaries.
+    """
+    loop = asyncio.get_running_loop()
+    
+    parts = None
+    if filename.lower().endswith('.pdf'):
+        parts = await loop.run_in_executor(partition_pool, split_pdf_for_streaming, content)
+    
+    if not parts:
+        result = await loop.run_in_executor(
+            partition_pool,
+            partition_document,
+            content,
+            filename,
+            request.output_format,
+            request.chunk_strategy,
+            request.max_chunk_size
+        )
+        for item in result:
+            yield item
+        return
+    
+    def submit(first_page, part):
+        return loop.run_in_executor(partition_pool, partition_page_range, part, first_page, filename, {})
+    
+    pending_parts = iter(parts)
+    futures = deque(submit(first_page, part) for first_page, part in islice(pending_parts, max(PARTITION_WORKERS, 1)))
+    carried = []
+    try:
+        for index in range(len(parts)):
+            element_dicts = carried + await futures.popleft()
+            carried = []
+            # Keep the window full: start the next range before formatting this one
+            for first_page, part in islice(pending_parts, 1):
+                futures.append(submit(first_page, part))
+            
+            if request.chunk_strategy == "by_title" and index < len(parts) - 1:
+                last_title = max(
+                    (idx for idx, element in enumerate(element_dicts) if element.get('type') == 'Title'),
+                    default=0
+                )
+                if last_title > 0:
+                    element_dicts, carried = element_dicts[:last_title], element_dicts[last_title:]
+            
+            if element_dicts:
+                items = await loop.run_in_executor(
+                    partition_pool,
+                    format_element_dicts,
+                    element_dicts,
+                    request.output_format,
+                    request.chunk_strategy,
+                    request.max_chunk_size
+                )
+                for item in items:
+                    yield item
+    finally:
+        for future in futures:
+            future.cancel()
+
+@app.on_event("shutdown")
+def shutdown_partition_pool():
+    """Stop the partition worker processes with the server"""
+    if partition_pool is not None:
+        partition_pool.shutdown(wait=False, cancel_futures=True)
+
+async def store_and_partition(doc_id: str, content: bytes, filename: str, request: ProcessRequest, user: dict):
+    """Save a document to S3 while it is partitioned in the process pool"""
+    s3_key = f"uploads/{user['user_id']}/{doc_id}/{filename}"
+    upload = run_in_threadpool(
+        s3_client.put_object,
+        Bucket=os.getenv('BUCKET_NAME'),
+        Key=s3_key,
+        Body=content
+    )
+    loop = asyncio.get_running_loop()
+    partitioning = loop.run_in_executor(
+        partition_pool,
+        partition_document,
+        content,
+        filename,
+        request.output_format,
+        request.chunk_strategy,
+        request.max_chunk_size
+    )
+    _, result = await asyncio.gather(upload, partitioning)
+    return result
+
+def record_usage(user: dict, units: int = 1):
+    """Increment the API key's usage counter through the write-behind meter"""
+    billing.track_usage(user['api_key'], units)
+    api_key_cache.add_usage(user['api_key'], units)
+
+async def run_document(doc_id: str, content: bytes, filename: str, request: ProcessRequest, user: dict):
+    """Store, partition and meter one document, returning the formatted result"""
+    result = await store_and_partition(doc_id, content, filename, request, user)
+    
+    # Track usage
+    await run_in_threadpool(record_usage, user)
+    
+    return result
+
+async def run_job(job: Job):
+    """Job queue runner for documents submitted in async mode"""
+    payload = job.payload
+    # Queue workers share the in-flight limit with synchronous requests, waiting rather than failing
+    async with admission.slot(wait=True):
+        return await run_document(
+            job.job_id,
+            payload['content'],
+            job.filename,
+            ProcessRequest(**payload['request']),
+            payload['user']
+        )
+
+job_queue = JobQueue(
+    run_job,
+    backend=InMemoryJobBackend(result_ttl_seconds=JOB_RESULT_TTL_SECONDS),
+    workers=MAX_IN_FLIGHT_JOBS,
+    max_queued=MAX_QUEUED_JOBS
+)
+
+@app.on_event("startup")
+async def start_job_queue():
+    """Start the async job workers with the server"""
+    await job_queue.start()
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    await job_queue.stop()
+
+@app.on_event("startup")
+def start_usage_meter():
+    """Flush buffered usage to the table in the background"""
+    billing.usage_meter.start()
+
+@app.on_event("shutdown")
+def stop_usage_meter():
+    billing.usage_meter.stop()
+
+async def stream_document(file: UploadFile, request: ProcessRequest, user: dict):
+    """Stream a document's result as NDJSON, one element or chunk per line"""
+    # The slot is taken before the 200 response starts, so saturation is still a clean 503;
+    # it is released when the stream ends, or by the background task if it never starts
+    slot = AsyncExitStack()
+    await slot.enter_async_context(admission.slot())
+    
+    doc_id = str(uuid.uuid4())
+    filename = file.filename
+    try:
+        content = await file.read()
+    except BaseException:
+        await slot.aclose()
+        raise
+    
+    async def stream_lines():
+        completed = False
+        try:
+            async with slot:
+                s3_key = f"uploads/{user['user_id']}/{doc_id}/{filename}"
+                upload = asyncio.ensure_future(run_in_threadpool(
+                    s3_client.put_object,
+                    Bucket=os.getenv('BUCKET_NAME'),
+                    Key=s3_key,
+                    Body=content
+                ))
+                
+                try:
+                    yield json.dumps({"document_id": doc_id, "status": "processing"}) + "\n"
+                    try:
+                        async for item in iter_result_items(content, filename, request):
+                            yield json.dumps(item) + "\n"
+                        await upload
+                    except Exception as e:
+                        # Let the upload settle before reporting; its own error is secondary here
+                        await asyncio.gather(upload, return_exceptions=True)
+                        yield json.dumps({"document_id": doc_id, "status": "error", "error": str(e)}) + "\n"
+                        return
+                finally:
+                    # On a client disconnect, cancel the upload and retrieve its outcome
+                    if not upload.done():
+                        upload.cancel()
+                        upload.add_done_callback(lambda task: task.cancelled() or task.exception())
+                
+                completed = True
+                yield json.dumps({"document_id": doc_id, "status": "success", "usage": {"documents_processed": 1}}) + "\n"
+        finally:
+            if completed:
+                asyncio.get_running_loop().run_in_executor(None, record_usage, user, 1)
+    
+    return StreamingResponse(stream_lines(), media_type=NDJSON_MEDIA_TYPE, background=BackgroundTask(slot.aclose))
 
 @app.post("/v1/process")
 async def process_document(
     file: UploadFile = File(...),
     request: ProcessRequest = Depends(),
-    user: dict = Depends(verify_api_key)
+    user: dict = Depends(verify_api_key),
+    accept: Optional[str] = Header(None)
 ):
-    """Process document and return AI-ready structured data"""
-    try:
+    """Process document and return AI-ready structured data
+
+    Send `Accept: application/x-ndjson` to stream one element or chunk per line.
+    """
+    if request.mode == "async":
         doc_id = str(uuid.uuid4())
-        content = await file.read()
-        
-        # Save to S3
-        s3_key = f"uploads/{user['user_id']}/{doc_id}/{file.filename}"
-        s3_client.put_object(
-            Bucket=os.getenv('BUCKET_NAME'),
-            Key=s3_key,
-            Body=content
+        job = Job(
+            job_id=doc_id,
+            owner_id=user['user_id'],
+            filename=file.filename,
+            payload={'content': await file.read(), 'request': request.dict(), 'user': user}
         )
+        try:
+            await job_queue.submit(job)
+        except QueueFullError:
+            raise HTTPException(
+                status_code=503,
+                detail="Job queue is full, please retry shortly",
+                headers={"Retry-After": "5"}
+            )
         
-        # Process with unstructured
-        with open(f"/tmp/{file.filename}", "wb") as f:
-            f.write(content)
-        
-        elements = partition(filename=f"/tmp/{file.filename}")
-        
-        # Apply chunking
-        if request.chunk_strategy == "by_title":
-            chunks = chunk_by_title(elements, max_characters=request.max_chunk_size)
-        else:
-            chunks = elements
+        return JSONResponse(status_code=202, content={
+            "document_id": doc_id,
+            "status": job.status,
+            "status_url": f"/v1/jobs/{doc_id}",
+            "result_url": f"/v1/jobs/{doc_id}/result"
+        })
+    
+    if accept and NDJSON_MEDIA_TYPE in accept:
+        return await stream_document(file, request, user)
+    
+    async with admission.slot():
+        try:
+            doc_id = str(uuid.uuid4())
+            content = await file.read()
+            result = await run_document(doc_id, content, file.filename, request, user)
+            
+            return {
+                "document_id": doc_id,
+                "status": "success",
+                "data": result,
+                "usage": {"documents_processed": 1}
+            }
         
-        # Convert to structured format
-        if request.output_format == "json":
-            result = convert_to_isd(chunks)
-        elif request.output_format == "chunks":
-            result = [{"text": str(c), "metadata": c.metadata.to_dict()} for c in chunks]
-        else:
-            result = [{"text": str(e)} for e in elements]
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+class BatchTooLargeError(Exception):
+    """Raised when a batch has too many documents or too many uncompressed bytes"""
+
+def read_batch_files(uploads: List[Tuple[str, bytes]]) -> List[Tuple[str, bytes]]:
+    """Expand zip archives in a batch upload into their member documents
+
+    Document counts and uncompressed sizes are checked against the zip headers
+    before anything is decompressed, so a zip bomb is rejected up front.
+    """
+    archives = []
+    count = 0
+    total_bytes = 0
+    for filename, content in uploads:
+        if not filename.lower().endswith('.zip'):
+            archives.append((filename, content, None))
+            count += 1
+            total_bytes += len(content)
+            continue
         
-        # Track usage
-        usage_table.update_item(
-            Key={'api_key': user['api_key']},
-            UpdateExpression='SET usage = usage + :inc, last_used = :time',
-            ExpressionAttributeValues={':inc': 1, ':time': datetime.utcnow().isoformat()}
+        archive = zipfile.ZipFile(io.BytesIO(content))
+        members = [
+            member for member in archive.infolist()
+            if not member.is_dir() and os.path.basename(member.filename) and not member.filename.startswith('__MACOSX/')
+        ]
+        archives.append((filename, archive, members))
+        count += len(members)
+        total_bytes += sum(member.file_size for member in members)
+        if any(member.file_size > MAX_BATCH_FILE_BYTES for member in members):
+            raise BatchTooLargeError(f"Documents are limited to {MAX_BATCH_FILE_BYTES // (1024 * 1024)} MB uncompressed")
+    
+    if count > MAX_BATCH_FILES:
+        raise BatchTooLargeError(f"Batches are limited to {MAX_BATCH_FILES} documents")
+    if total_bytes > MAX_BATCH_TOTAL_BYTES:
+        raise BatchTooLargeError(f"Batches are limited to {MAX_BATCH_TOTAL_BYTES // (1024 * 1024)} MB uncompressed")
+    
+    documents = []
+    for filename, source, members in archives:
+        if members is None:
+            documents.append((filename, source))
+            continue
+        with source as archive:
+            for member in members:
+                documents.append((os.path.basename(member.filename), archive.read(member)))
+    return documents
+
+@app.post("/v1/process/batch")
+async def process_batch(
+    files: List[UploadFile] = File(...),
+    request: ProcessRequest = Depends(),
+    user: dict = Depends(verify_api_key)
+):
+    """Process many documents (or zip archives of documents) and stream NDJSON results as they complete"""
+    uploads = [(f.filename, await f.read()) for f in files]
+    try:
+        documents = await run_in_threadpool(read_batch_files, uploads)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Invalid zip archive")
+    except BatchTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    if not documents:
+        raise HTTPException(status_code=400, detail="No documents in batch")
+    if user.get('usage', 0) + len(documents) > user.get('limit', 1000):
+        raise HTTPException(status_code=429, detail="Batch would exceed usage limit")
+    if admission.saturated:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is at capacity, please retry shortly",
+            headers={"Retry-After": "5"}
         )
-        
-        return {
-            "document_id": doc_id,
-            "status": "success",
-            "data": result,
-            "usage": {"documents_processed": 1}
-        }
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # Each document takes its own admission slot, at most BATCH_CONCURRENCY at a time,
+    # so single requests queue alongside the batch instead of behind all of it
+    batch_limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def process_one(filename: str, content: bytes):
+        doc_id = str(uuid.uuid4())
+        try:
+            async with batch_limit, admission.slot(wait=True):
+                result = await store_and_partition(doc_id, content, filename, request, user)
+            return {"filename": filename, "document_id": doc_id, "status": "success", "data": result}
+        except Exception as e:
+            return {"filename": filename, "document_id": doc_id, "status": "error", "error": str(e)}
+    
+    async def stream_results():
+        processed = 0
+        failed = 0
+        try:
+            tasks = [asyncio.create_task(process_one(name, content)) for name, content in documents]
+            try:
+                for finished in asyncio.as_completed(tasks):
+                    item = await finished
+                    if item["status"] == "success":
+                        processed += 1
+                    else:
+                        failed += 1
+                    yield json.dumps(item) + "\n"
+            finally:
+                for task in tasks:
+                    task.cancel()
+            
+            yield json.dumps({"summary": {"documents_processed": processed, "documents_failed": failed}}) + "\n"
+        finally:
+            # One aggregated usage write per batch, even if the client disconnects mid-stream
+            if processed:
+                asyncio.get_running_loop().run_in_executor(None, record_usage, user, processed)
+    
+    return StreamingResponse(stream_results(), media_type=NDJSON_MEDIA_TYPE)
+
+def get_owned_job(job_id: str, user: dict) -> Job:
+    """Look up a job, hiding jobs that belong to other users"""
+    job = job_queue.get(job_id)
+    if job is None or job.owner_id != user['user_id']:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/v1/jobs/{job_id}")
+async def get_job(job_id: str, user: dict = Depends(verify_api_key)):
+    """Get the status of an async processing job"""
+    job = get_owned_job(job_id, user)
+    return {"document_id": job.job_id, **job.to_dict()}
+
+@app.get("/v1/jobs/{job_id}/result")
+async def get_job_result(job_id: str, user: dict = Depends(verify_api_key)):
+    """Stream the result of a completed async processing job"""
+    job = get_owned_job(job_id, user)
+    if job.status == JOB_FAILED:
+        raise HTTPException(status_code=500, detail=job.error)
+    if job.status != JOB_COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    
+    result = job_queue.get_result(job_id)
+    if result is None:
+        raise HTTPException(status_code=410, detail="Job result has expired")
+    
+    def stream_result():
+        # Emit the same envelope as the synchronous response, one element at a time
+        yield f'{{"document_id": {json.dumps(job.job_id)}, "status": "success", "data": ['
+        for idx, item in enumerate(result):
+            yield ("," if idx else "") + json.dumps(item)
+        yield '], "usage": {"documents_processed": 1}}'
+    
+    return StreamingResponse(stream_result(), media_type="application/json")
+
+@app.get("/v1/metrics/metering")
+async def get_metering_metrics(user: dict = Depends(verify_api_key)):
+    """Usage metering backlog and flush statistics for this server"""
+    return billing.usage_meter.metrics()
 
 @app.get("/v1/usage")
 async def get_usage(user: dict = Depends(verify_api_key)):
@@ -9,10 +9,27 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import time
+from itertools import chain
 from datetime import datetime
 import io
 import base64
-from auth import is_authenticated, show_auth_dialog, show_user_profile_sidebar
+from concurrent.futures import ThreadPoolExecutor
+from auth import (
+    api_client,
+    commit_credits,
+    is_authenticated,
+    release_credits,
+    request_document_processing,
+    reserve_credits,
+    show_auth_dialog,
+    show_user_profile_sidebar,
+)
+from partition_cache import PartitionCache
+from parallel_partition import DEFAULT_WORKERS, MIN_PAGES_FOR_PARALLEL, partition_pdf_pages
+from schema_projection import SchemaProjection, element_type_counts
+from element_table import ElementTable
+from result_pager import VIEWER_PAGE_SIZES, ResultPager, rows_key
+from json_export import JsonExport
 # Import unstructured components
 try:
     from unstructured.partition.auto import partition
@@ -25,10 +42,10 @@ try:
     from unstructured.documents.elements import Element, Text, Title, NarrativeText, Table, Image
     from unstructured.chunking.title import chunk_by_title
     from unstructured.chunking.basic import chunk_elements
-    from unstructured.cleaners.core import clean_extra_whitespace, clean_non_ascii_chars, clean_bullets
     from unstructured.embed.openai import OpenAIEmbeddingEncoder
     from unstructured.staging.base import convert_to_isd
     from unstructured.staging.huggingface import stage_for_transformers
+    from text_cleaning import clean_elements_batch, iter_clean_elements
 except ImportError as e:
     st.error(f"Unstructured library not found. Please install it: pip install unstructured[all]")
     st.stop()
@@ -226,6 +243,10 @@ def initialize_session_state():
         st.session_state.processing_history = []
     if 'current_file_info' not in st.session_state:
         st.session_state.current_file_info = {}
+    if 'pipeline' not in st.session_state:
+        st.session_state.pipeline = {}
+    if 'llm_extraction' not in st.session_state:
+        st.session_state.llm_extraction = None
 
 def add_schema_field():
     """Add a new schema field"""
@@ -241,6 +262,9 @@ def remove_schema_field(index):
     if 0 <= index < len(st.session_state.schema_fields):
         st.session_state.schema_fields.pop(index)
 
+# Formats whose partitioners convert through external tools that read from a path
+PATH_ONLY_FILE_TYPES = {'rtf', 'odt'}
+
 def get_partition_function(file_type: str):
     """Get the appropriate partition function based on file type"""
     partition_map = {
@@ -252,158 +276,276 @@ def get_partition_function(file_type: str):
     }
     return partition_map.get(file_type, partition)
 
-def process_document(uploaded_file, processing_options):
-    """Enhanced document processing with poppler-free PDF handling"""
-    try:
-        # Create a temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{uploaded_file.name.split('.')[-1]}") as tmp_file:
-            tmp_file.write(uploaded_file.getbuffer())
-            tmp_file_path = tmp_file.name
+@st.cache_resource
+def get_partition_cache():
+    """Shared on-disk cache of raw partition results"""
+    return PartitionCache()
 
-        file_type = uploaded_file.name.split('.')[-1].lower()
+def build_partition_args(file_type: str, processing_options: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the partition keyword arguments (minus the file itself) for a file type"""
+    if file_type == 'pdf':
+        return {
+            'strategy': 'fast',  # Use fast strategy to avoid poppler
+            'include_page_breaks': processing_options.get('include_page_breaks', True),
+        }
+
+    partition_args = {
+        'strategy': processing_options.get('strategy', 'auto'),
+        'include_page_breaks': processing_options.get('include_page_breaks', True),
+        'infer_table_structure': processing_options.get('infer_table_structure', True),
+    }
+    
+    # Add specific options based on strategy
+    if processing_options.get('strategy') == 'hi_res':
+        partition_args['hi_res'] = True
+    elif processing_options.get('strategy') == 'ocr_only':
+        partition_args['ocr_languages'] = ['eng']
+    
+    # Add coordinates extraction if requested
+    if processing_options.get('extract_coordinates', False):
+        partition_args['coordinates'] = True
+
+    return partition_args
+
+def iter_pdf_fallback_elements(pdf_reader, filename: str):
+    """Yield basic Title/Text elements from a PyPDF2 reader one page at a time"""
+    for page_num, page in enumerate(pdf_reader.pages, 1):
+        try:
+            text = page.extract_text()
+        except Exception as page_error:
+            st.warning(f"Error processing page {page_num}: {str(page_error)}")
+            continue
         
-        # Special handling for PDF files without poppler
-        if file_type == 'pdf':
+        if not text.strip():
+            continue
+        
+        # Split text into paragraphs
+        for para in text.split('\n\n'):
+            para = para.strip()
+            if not para:
+                continue
+            
+            # Simple heuristic: if paragraph is short and capitalized, treat as title
+            if len(para) < 100 and para.isupper():
+                element = Title(text=para)
+            else:
+                element = Text(text=para)
+            
+            # Add metadata
+            element.metadata.page_number = page_num
+            element.metadata.filename = filename
+            yield element
+
+def iter_pdf_fallback_with_progress(pdf_reader, filename: str):
+    """Fallback elements with a progress bar and the first result shown as soon as it is extracted"""
+    page_count = len(pdf_reader.pages)
+    page_progress = st.progress(0.0)
+    first_result = st.empty()
+    extracted = False
+    
+    for element in iter_pdf_fallback_elements(pdf_reader, filename):
+        if not extracted:
+            first_result.caption(f"📄 Page {element.metadata.page_number}: {element.text[:200]}")
+            extracted = True
+        page_progress.progress(element.metadata.page_number / page_count)
+        yield element
+    
+    st.success(f"✅ Successfully extracted text from {page_count} pages using basic method")
+
+def partition_from_path(uploaded_file, partition_func, partition_args: Dict[str, Any]):
+    """Spill an upload to a temporary file for partitioners that need a real path"""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=f".{uploaded_file.name.split('.')[-1]}") as tmp_file:
+        tmp_file.write(uploaded_file.getbuffer())
+        tmp_file_path = tmp_file.name
+    
+    try:
+        return partition_func(filename=tmp_file_path, metadata_filename=uploaded_file.name, **partition_args)
+    finally:
+        # Clean up temporary file
+        os.unlink(tmp_file_path)
+
+def partition_uploaded_file(uploaded_file, file_type: str, partition_args: Dict[str, Any], pdf_workers: int = 1):
+    """Run the partition step for an upload, with the PyPDF2 fallback for PDFs
+
+    Returns (elements, method), where method is 'unstructured' or 'pypdf2_fallback';
+    elements is None when every method failed. Fallback elements are a lazy iterator,
+    extracted page by page as they are consumed.
+    """
+    # Uploads are already in memory, so partition straight from the buffer
+    uploaded_file.seek(0)
+    
+    # Special handling for PDF files without poppler
+    if file_type == 'pdf':
+        try:
+            # Large PDFs are split into page ranges and partitioned across processes
+            if pdf_workers > 1:
+                try:
+                    elements = partition_pdf_pages(
+                        uploaded_file.getvalue(),
+                        uploaded_file.name,
+                        partition_args,
+                        max_workers=pdf_workers
+                    )
+                except Exception as parallel_error:
+                    # e.g. an encrypted PDF that can't be split; the single-process path may still read it
+                    st.warning(f"Parallel PDF processing failed, retrying in one process: {str(parallel_error)}")
+                    elements = None
+                if elements is not None:
+                    return elements, 'unstructured'
+            
+            # First attempt: Use unstructured with basic strategy
+            return partition(file=uploaded_file, metadata_filename=uploaded_file.name, **partition_args), 'unstructured'
+            
+        except Exception as pdf_error:
+            st.warning(f"Advanced PDF processing failed: {str(pdf_error)}")
+            st.info("🔄 Falling back to basic PDF text extraction...")
+            
             try:
-                # Try using PyPDF for basic text extraction
+                # Fallback: Manual PDF text extraction using PyPDF2
                 import PyPDF2
                 
-                # First attempt: Use unstructured with basic strategy
-                elements = partition(
-                    filename=tmp_file_path,
-                    strategy='fast',  # Use fast strategy to avoid poppler
-                    include_page_breaks=processing_options.get('include_page_breaks', True),
-                )
+                uploaded_file.seek(0)
+                pdf_reader = PyPDF2.PdfReader(uploaded_file)
+                elements = iter_pdf_fallback_with_progress(pdf_reader, uploaded_file.name)
                 
-            except Exception as pdf_error:
-                st.warning(f"Advanced PDF processing failed: {str(pdf_error)}")
-                st.info("🔄 Falling back to basic PDF text extraction...")
+                # Only the first page with text is extracted here; the rest follow as the caller consumes them
+                first = next(elements, None)
+                if first is None:
+                    st.error("Could not extract any text from PDF")
+                    return None, None
                 
+                return chain([first], elements), 'pypdf2_fallback'
+                
+            except ImportError:
+                st.error("PyPDF2 not installed. Installing now...")
                 try:
-                    # Fallback: Manual PDF text extraction using PyPDF2
-                    import PyPDF2
-                    from unstructured.documents.elements import Text, Title
+                    import subprocess
+                    import sys
+                    subprocess.check_call([sys.executable, "-m", "pip", "install", "PyPDF2"])
+                    st.success("PyPDF2 installed! Please refresh the page and try again.")
+                    return None, None
+                except Exception as install_error:
+                    st.error(f"Failed to install PyPDF2: {str(install_error)}")
+                    return None, None
                     
-                    with open(tmp_file_path, 'rb') as pdf_file:
-                        pdf_reader = PyPDF2.PdfReader(pdf_file)
-                        elements = []
-                        
-                        for page_num, page in enumerate(pdf_reader.pages, 1):
-                            try:
-                                text = page.extract_text()
-                                if text.strip():
-                                    # Split text into paragraphs
-                                    paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
-                                    
-                                    for para in paragraphs:
-                                        # Simple heuristic: if paragraph is short and capitalized, treat as title
-                                        if len(para) < 100 and para.isupper():
-                                            element = Title(text=para)
-                                        else:
-                                            element = Text(text=para)
-                                        
-                                        # Add metadata
-                                        element.metadata.page_number = page_num
-                                        element.metadata.filename = uploaded_file.name
-                                        elements.append(element)
-                                        
-                            except Exception as page_error:
-                                st.warning(f"Error processing page {page_num}: {str(page_error)}")
-                                continue
-                    
-                    if not elements:
-                        st.error("Could not extract any text from PDF")
-                        return None
-                        
-                    st.success(f"✅ Successfully extracted text from {len(pdf_reader.pages)} pages using basic method")
-                    
-                except ImportError:
-                    st.error("PyPDF2 not installed. Installing now...")
-                    try:
-                        import subprocess
-                        import sys
-                        subprocess.check_call([sys.executable, "-m", "pip", "install", "PyPDF2"])
-                        st.success("PyPDF2 installed! Please refresh the page and try again.")
-                        return None
-                    except Exception as install_error:
-                        st.error(f"Failed to install PyPDF2: {str(install_error)}")
-                        return None
-                        
-                except Exception as fallback_error:
-                    st.error(f"All PDF processing methods failed: {str(fallback_error)}")
-                    st.markdown("""
-                    ### 💡 Alternative Solutions:
-                    1. **Convert PDF to text first**: Use online tools to convert PDF to TXT
-                    2. **Use different file format**: Try DOCX or HTML instead
-                    3. **Install poppler**: Follow the installation guide for full PDF support
-                    """)
-                    return None
-        else:
-            # Non-PDF files - use original logic
-            partition_func = get_partition_function(file_type)
-            
-            # Build partition arguments
-            partition_args = {
-                'filename': tmp_file_path,
-                'strategy': processing_options.get('strategy', 'auto'),
-                'include_page_breaks': processing_options.get('include_page_breaks', True),
-                'infer_table_structure': processing_options.get('infer_table_structure', True),
-            }
-            
-            # Add specific options based on strategy
-            if processing_options.get('strategy') == 'hi_res':
-                partition_args['hi_res'] = True
-            elif processing_options.get('strategy') == 'ocr_only':
-                partition_args['ocr_languages'] = ['eng']
-            
-            # Add coordinates extraction if requested
-            if processing_options.get('extract_coordinates', False):
-                partition_args['coordinates'] = True
-            
-            # Process with unstructured
-            elements = partition_func(**partition_args)
+            except Exception as fallback_error:
+                st.error(f"All PDF processing methods failed: {str(fallback_error)}")
+                st.markdown("""
+                ### 💡 Alternative Solutions:
+                1. **Convert PDF to text first**: Use online tools to convert PDF to TXT
+                2. **Use different file format**: Try DOCX or HTML instead
+                3. **Install poppler**: Follow the installation guide for full PDF support
+                """)
+                return None, None
+    else:
+        # Non-PDF files - use original logic
+        partition_func = get_partition_function(file_type)
         
-        # Apply advanced cleaning (common for all file types)
-        cleaned_elements = []
-        for element in elements:
-            if hasattr(element, 'text') and element.text:
-                # Basic cleaning
-                if processing_options.get('clean_text', False):
-                    element.text = clean_extra_whitespace(element.text)
-                
-                if processing_options.get('clean_non_ascii', False):
-                    element.text = clean_non_ascii_chars(element.text)
-                
-                if processing_options.get('clean_bullets', False):
-                    element.text = clean_bullets(element.text)
-                
-                # Filter by minimum text length
-                min_length = processing_options.get('min_text_length', 0)
-                if len(element.text.strip()) >= min_length:
-                    cleaned_elements.append(element)
-            else:
-                cleaned_elements.append(element)
+        if file_type in PATH_ONLY_FILE_TYPES:
+            return partition_from_path(uploaded_file, partition_func, partition_args), 'unstructured'
         
-        elements = cleaned_elements
+        # Process with unstructured
+        return partition_func(file=uploaded_file, metadata_filename=uploaded_file.name, **partition_args), 'unstructured'
+
+CLEANING_OPTION_KEYS = ('clean_text', 'clean_non_ascii', 'clean_bullets', 'min_text_length')
+CHUNKING_OPTION_KEYS = ('chunking_strategy', 'max_chunk_size', 'new_after_chars', 'combine_under_chars')
+
+def get_stage_options(processing_options: Dict[str, Any], keys) -> Dict[str, Any]:
+    """Pick the subset of processing options a pipeline stage depends on"""
+    return {key: processing_options.get(key) for key in keys}
+
+def apply_chunking(elements, processing_options):
+    """Apply the selected chunking strategy"""
+    if processing_options.get('chunking_strategy') == 'by_title':
+        return chunk_by_title(
+            elements,
+            max_characters=processing_options.get('max_chunk_size', 1000),
+            new_after_n_chars=processing_options.get('new_after_chars', 800),
+            combine_text_under_n_chars=processing_options.get('combine_under_chars', 200)
+        )
+    elif processing_options.get('chunking_strategy') == 'basic':
+        return chunk_elements(
+            elements,
+            max_characters=processing_options.get('max_chunk_size', 1000)
+        )
+    return elements
+
+def post_processing_changed(processing_options) -> bool:
+    """Check whether any post-processing stage is stale for the held partition output"""
+    pipeline = st.session_state.pipeline
+    return (
+        pipeline.get('clean_options') != get_stage_options(processing_options, CLEANING_OPTION_KEYS)
+        or pipeline.get('chunk_options') != get_stage_options(processing_options, CHUNKING_OPTION_KEYS)
+    )
+
+def run_post_processing(processing_options):
+    """Recompute only the stages downstream of the held partition output whose options changed"""
+    pipeline = st.session_state.pipeline
+    
+    clean_options = get_stage_options(processing_options, CLEANING_OPTION_KEYS)
+    if pipeline.get('clean_options') != clean_options:
+        pipeline['cleaned'] = clean_elements_batch(pipeline['raw'], processing_options)
+        pipeline['clean_options'] = clean_options
+        pipeline['chunk_options'] = None
+    
+    chunk_options = get_stage_options(processing_options, CHUNKING_OPTION_KEYS)
+    if pipeline.get('chunk_options') != chunk_options:
+        pipeline['chunked'] = apply_chunking(pipeline['cleaned'], processing_options)
+        pipeline['chunk_options'] = chunk_options
+    
+    return pipeline['chunked']
+
+def process_document(uploaded_file, processing_options):
+    """Enhanced document processing with poppler-free PDF handling"""
+    try:
+        file_type = uploaded_file.name.split('.')[-1].lower()
+        partition_args = build_partition_args(file_type, processing_options)
         
-        # Apply chunking strategies
-        if processing_options.get('chunking_strategy') == 'by_title':
-            elements = chunk_by_title(
-                elements,
-                max_characters=processing_options.get('max_chunk_size', 1000),
-                new_after_n_chars=processing_options.get('new_after_chars', 800),
-                combine_text_under_n_chars=processing_options.get('combine_under_chars', 200)
-            )
-        elif processing_options.get('chunking_strategy') == 'basic':
-            elements = chunk_elements(
-                elements,
-                max_characters=processing_options.get('max_chunk_size', 1000)
-            )
+        # Reuse the raw partition output when the same bytes were processed with the same arguments;
+        # only unstructured output is cached, and the key says so to skip entries from older versions
+        partition_cache = get_partition_cache()
+        cache_key = partition_cache.make_key(
+            uploaded_file.getbuffer(),
+            {'file_type': file_type, 'metadata_filename': uploaded_file.name, 'method': 'unstructured', **partition_args}
+        )
         
-        # Clean up temporary file
-        os.unlink(tmp_file_path)
+        if st.session_state.pipeline.get('raw_key') == cache_key:
+            st.info("⚡ Reusing partition results from this session")
+        else:
+            elements = partition_cache.get(cache_key)
+            
+            if elements is not None:
+                st.info("⚡ Loaded partition results from cache")
+            else:
+                elements, method = partition_uploaded_file(
+                    uploaded_file,
+                    file_type,
+                    partition_args,
+                    pdf_workers=processing_options.get('pdf_workers', 1)
+                )
+                if elements is None:
+                    return None
+                if method != 'unstructured':
+                    # Degraded fallback output is used once, never cached or held: the next run retries
+                    # unstructured, so it is cleaned as pages are extracted and no raw copy is kept
+                    st.session_state.pipeline = {
+                        'raw_key': None,
+                        'raw': None,
+                        'filename': uploaded_file.name,
+                        'cleaned': list(iter_clean_elements(elements, processing_options)),
+                        'clean_options': get_stage_options(processing_options, CLEANING_OPTION_KEYS)
+                    }
+                    return run_post_processing(processing_options)
+                partition_cache.put(cache_key, elements)
+            
+            # A new raw result invalidates every downstream stage
+            st.session_state.pipeline = {
+                'raw_key': cache_key,
+                'raw': elements,
+                'filename': uploaded_file.name
+            }
         
-        return elements
+        return run_post_processing(processing_options)
 
     except Exception as e:
         st.error(f"Error processing document: {str(e)}")
@@ -432,10 +574,19 @@ def process_document(uploaded_file, processing_options):
         
         return None
 
+def get_element_table(elements):
+    """Dicts and columns for a processed element list, built once and reused across reruns"""
+    table = st.session_state.get('element_table')
+    if table is None or table.elements is not elements:
+        table = ElementTable(elements)
+        st.session_state.element_table = table
+    return table
+
 def apply_custom_schema(elements, schema_fields):
     """Enhanced schema application with more field types"""
     try:
-        element_dicts = [element.to_dict() for element in elements]
+        element_table = get_element_table(elements)
+        element_dicts = element_table.dicts
         
         schema_output = {
             "metadata": {
@@ -454,48 +605,9 @@ def apply_custom_schema(elements, schema_fields):
             "content": []
         }
         
-        # Calculate element type distribution
-        element_types = {}
-        for element_dict in element_dicts:
-            elem_type = element_dict.get("type", "unknown")
-            element_types[elem_type] = element_types.get(elem_type, 0) + 1
-        
-        schema_output["metadata"]["element_types"] = element_types
-        
-        # Process each element according to schema
-        for idx, element_dict in enumerate(element_dicts):
-            processed_element = {
-                "element_id": element_dict.get("element_id", f"elem_{idx}"),
-                "type": element_dict.get("type", ""),
-                "text": element_dict.get("text", ""),
-                "metadata": element_dict.get("metadata", {})
-            }
-            
-            # Apply custom schema fields
-            for field in schema_fields:
-                if field['field_name']:
-                    field_type = field['field_type']
-                    
-                    if field_type == 'extracted_text':
-                        processed_element[field['field_name']] = element_dict.get("text", "")
-                    elif field_type == 'element_type':
-                        processed_element[field['field_name']] = element_dict.get("type", "")
-                    elif field_type == 'page_number':
-                        processed_element[field['field_name']] = element_dict.get("metadata", {}).get("page_number", None)
-                    elif field_type == 'coordinates':
-                        processed_element[field['field_name']] = element_dict.get("metadata", {}).get("coordinates", None)
-                    elif field_type == 'text_length':
-                        processed_element[field['field_name']] = len(element_dict.get("text", ""))
-                    elif field_type == 'word_count':
-                        processed_element[field['field_name']] = len(element_dict.get("text", "").split())
-                    elif field_type == 'parent_id':
-                        processed_element[field['field_name']] = element_dict.get("metadata", {}).get("parent_id", None)
-                    elif field_type == 'filename':
-                        processed_element[field['field_name']] = element_dict.get("metadata", {}).get("filename", None)
-                    elif field_type == 'custom':
-                        processed_element[field['field_name']] = f"Custom field: {field['description']}"
-            
-            schema_output["content"].append(processed_element)
+        # Schema fields are compiled once and projected column by column
+        schema_output["metadata"]["element_types"] = element_type_counts(element_dicts)
+        schema_output["content"] = SchemaProjection(schema_fields).project(element_dicts, element_table.columns)
         
         return schema_output
 
@@ -503,9 +615,74 @@ def apply_custom_schema(elements, schema_fields):
         st.error(f"Error applying schema: {str(e)}")
         return None
 
-def render_json_viewer(json_data):
-    """Render an interactive JSON viewer"""
-    json_str = json.dumps(json_data, indent=2)
+def build_final_output(elements, filename, processing_options):
+    """Apply the custom schema, or build the standard output when no schema is defined"""
+    if st.session_state.schema_fields:
+        final_json = apply_custom_schema(elements, st.session_state.schema_fields)
+    else:
+        final_json = {
+            "metadata": {
+                "total_elements": len(elements),
+                "processing_timestamp": pd.Timestamp.now().isoformat(),
+                "filename": filename,
+                "processing_options": processing_options
+            },
+            "elements": list(get_element_table(elements).dicts)
+        }
+    
+    # Attach the cloud AI extraction when it was requested for this document
+    llm_extraction = st.session_state.get('llm_extraction')
+    if final_json and llm_extraction and llm_extraction.get('filename') == filename:
+        final_json["structured_data"] = llm_extraction.get('structured_data')
+    return final_json
+
+def start_viewer_page(total, page_size, view_key):
+    """Prev/next controls for the Results viewer; returns the pager for this rerun and a slot for its caption"""
+    if st.session_state.get('viewer_key') != view_key:
+        st.session_state.viewer_key = view_key
+        st.session_state.viewer_cursor = 0
+        st.session_state.viewer_next_cursor = None
+    cursor = st.session_state.get('viewer_cursor', 0)
+    
+    nav_prev, nav_info, nav_next = st.columns([1, 2, 1])
+    with nav_prev:
+        if st.button("⬅️ Previous", disabled=cursor == 0, use_container_width=True) and cursor:
+            cursor = max(0, cursor - page_size)
+    with nav_next:
+        next_cursor = st.session_state.get('viewer_next_cursor')
+        if st.button("Next ➡️", disabled=next_cursor is None, use_container_width=True) and next_cursor is not None:
+            cursor = next_cursor
+    
+    st.session_state.viewer_cursor = cursor
+    return ResultPager(total, page_size, cursor=cursor), nav_info.empty()
+
+def finish_viewer_page(pager, caption_slot):
+    """Remember where the next page starts and show which rows were rendered"""
+    st.session_state.viewer_next_cursor = pager.next_cursor
+    if pager.rendered < min(pager.page_size, pager.total - pager.cursor):
+        caption_slot.caption(f"Rows {pager.first_row:,}–{pager.last_row:,} of {pager.total:,} (page cut at the display size limit)")
+    else:
+        caption_slot.caption(f"Rows {pager.first_row:,}–{pager.last_row:,} of {pager.total:,}")
+
+def get_json_export(json_data, compress):
+    """The finished JSON export for this result, if one was prepared with the same compression"""
+    export = st.session_state.get('json_export')
+    if export and export.source is json_data and export.compress == compress:
+        return export
+    return None
+
+def prepare_json_export(json_data, compress):
+    """Encode the result into a spooled temp file, replacing any earlier export"""
+    previous = st.session_state.get('json_export')
+    if previous:
+        previous.close()
+    export = JsonExport(json_data, compress=compress)
+    st.session_state.json_export = export
+    return export
+
+def render_json_viewer(json_data, pager=None):
+    """Render an interactive JSON viewer, serializing only the pager's current page of rows"""
+    json_str = pager.render_json(json_data) if pager else json.dumps(json_data, indent=2)
     
     # Color-coded JSON display
     st.markdown(f"""
@@ -514,9 +691,9 @@ def render_json_viewer(json_data):
     </div>
     """, unsafe_allow_html=True)
 
-def render_element_cards(elements):
-    """Render elements as interactive cards"""
-    for idx, element in enumerate(elements):
+def render_element_cards(elements, start=0):
+    """Render elements as interactive cards, numbered from start"""
+    for idx, element in enumerate(elements, start):
         element_dict = element.to_dict() if hasattr(element, 'to_dict') else element
         
         element_type = element_dict.get('type', 'Unknown')
@@ -552,7 +729,7 @@ def render_element_cards(elements):
         </div>
         """, unsafe_allow_html=True)
 
-def create_analytics_dashboard(json_data):
+def create_analytics_dashboard(json_data, element_table=None):
     """Create comprehensive analytics dashboard"""
     if not json_data or 'content' not in json_data:
         st.warning("No data available for analytics")
@@ -589,12 +766,15 @@ def create_analytics_dashboard(json_data):
         fig_hist.update_layout(height=400)
         st.plotly_chart(fig_hist, use_container_width=True)
     
-    # Page-wise element count (if available)
-    page_data = {}
-    for item in content:
-        page = item.get('metadata', {}).get('page_number', 'Unknown')
-        if page != 'Unknown' and page is not None:
-            page_data[page] = page_data.get(page, 0) + 1
+    # Page-wise element count (if available), read from the page index when the table backs this output
+    if element_table is not None and len(element_table) == len(content):
+        page_data = element_table.page_counts
+    else:
+        page_data = {}
+        for item in content:
+            page = item.get('metadata', {}).get('page_number', 'Unknown')
+            if page != 'Unknown' and page is not None:
+                page_data[page] = page_data.get(page, 0) + 1
     
     if page_data:
         pages = sorted(page_data.keys())
@@ -644,6 +824,13 @@ def main():
         infer_table_structure = st.checkbox("📊 Infer Table Structure", value=True)
         extract_coordinates = st.checkbox("📍 Extract Coordinates", value=False)
         extract_images = st.checkbox("🖼️ Extract Images (PDF)", value=False)
+        pdf_workers = st.number_input(
+            "⚡ Parallel PDF Workers",
+            min_value=1,
+            max_value=os.cpu_count() or 1,
+            value=min(DEFAULT_WORKERS, os.cpu_count() or 1),
+            help=f"Split PDFs with {MIN_PAGES_FOR_PARALLEL}+ pages into page ranges processed in parallel. 1 disables parallel processing."
+        )
         
         # Text processing
         st.markdown("#### 📝 Text Processing")
@@ -666,7 +853,34 @@ def main():
             combine_under_chars = st.slider("Combine Under", 50, 500, 200)
         else:
             max_chunk_size = new_after_chars = combine_under_chars = 0
-    
+
+        # Cloud extraction
+        st.markdown("#### 🤖 AI Extraction")
+        ai_extraction = st.checkbox(
+            "🧠 Structured AI Extraction",
+            value=False,
+            help="Also send the document to the cloud API for LLM structured extraction. Runs alongside local processing and uses the same credit."
+        )
+
+        # Partition cache counters
+        st.markdown("#### 🗄️ Partition Cache")
+        cache_stats = get_partition_cache().stats()
+        cache_col1, cache_col2 = st.columns(2)
+        with cache_col1:
+            st.metric("Hits", cache_stats['hits'])
+        with cache_col2:
+            st.metric("Misses", cache_stats['misses'])
+        st.caption(f"{cache_stats['entries']} entries | {cache_stats['size_bytes'] / (1024 * 1024):.1f} MB")
+
+        # Latency of calls to the cloud API, per endpoint, from the shared HTTP client
+        api_stats = api_client.stats()
+        if api_stats:
+            with st.expander("🌐 API Latency"):
+                st.dataframe(
+                    pd.DataFrame.from_dict(api_stats, orient='index'),
+                    use_container_width=True
+                )
+
     # Processing options dictionary
     processing_options = {
         'strategy': processing_strategy,
@@ -675,6 +889,7 @@ def main():
         'infer_table_structure': infer_table_structure,
         'extract_coordinates': extract_coordinates,
         'extract_images': extract_images,
+        'pdf_workers': pdf_workers,
         'clean_text': clean_text,
         'clean_non_ascii': clean_non_ascii,
         'clean_bullets': clean_bullets,
@@ -682,9 +897,25 @@ def main():
         'chunking_strategy': chunking_strategy if chunking_strategy != "none" else None,
         'max_chunk_size': max_chunk_size,
         'new_after_chars': new_after_chars,
-        'combine_under_chars': combine_under_chars
+        'combine_under_chars': combine_under_chars,
+        'ai_extraction': ai_extraction
     }
     
+    # Option changes after processing only re-run the stale post-processing stages
+    if (
+        st.session_state.processed_elements is not None
+        and st.session_state.pipeline.get('raw') is not None
+        and post_processing_changed(processing_options)
+    ):
+        try:
+            elements = run_post_processing(processing_options)
+            st.session_state.processed_elements = elements
+            final_json = build_final_output(elements, st.session_state.pipeline['filename'], processing_options)
+            if final_json:
+                st.session_state.final_json = final_json
+        except Exception as e:
+            st.error(f"Error re-applying processing options: {str(e)}")
+    
     # Main content area with tabs
     tab1, tab2, tab3, tab4, tab5 = st.tabs([
         "📤 Upload & Process", 
@@ -782,25 +1013,64 @@ def main():
                                 progress_bar.progress((i + 1) / len(steps))
                                 time.sleep(0.3)
                             
-                            elements = process_document(uploaded_file, processing_options)
+                            token = st.session_state.get('token')
+                            st.session_state.llm_extraction = None
                             
-                            if elements:
-                                # Deduct credit via API
-                                from auth import process_document_with_credit
-                                token = st.session_state.get('token')
+                            with ThreadPoolExecutor(max_workers=1) as extraction_pool:
+                                extraction = None
+                                reservation_id = None
                                 
-                                if token:
-                                    # Call API to deduct credit
-                                    uploaded_file.seek(0)  # Reset file pointer
-                                    api_result, api_error = process_document_with_credit(
-                                        token, 
-                                        uploaded_file.read(), 
+                                if token and processing_options['ai_extraction']:
+                                    # The cloud extraction deducts the credit itself, so run it alongside local processing
+                                    uploaded_file.seek(0)
+                                    extraction = extraction_pool.submit(
+                                        request_document_processing,
+                                        token,
+                                        uploaded_file.read(),
                                         uploaded_file.name
                                     )
-                                    
-                                    if api_result and 'credits_remaining' in api_result:
-                                        st.session_state.credits = api_result['credits_remaining']
-                                        st.info(f"💳 Credit used! Remaining credits: {api_result['credits_remaining']}")
+                                elif token:
+                                    # Only metering is needed, so hold a credit instead of sending the document
+                                    reservation, reserve_error = reserve_credits(token, uploaded_file.name)
+                                    if reserve_error:
+                                        st.error(f"❌ Could not reserve a credit: {reserve_error}")
+                                        st.stop()
+                                    reservation_id = reservation['reservation_id']
+                                
+                                elements = None
+                                credit_result = credit_error = None
+                                try:
+                                    elements = process_document(uploaded_file, processing_options)
+                                finally:
+                                    # Settle the hold even when the run is interrupted (rerun, st.stop);
+                                    # holds that are never settled expire on the server
+                                    if reservation_id:
+                                        if elements:
+                                            credit_result, credit_error = commit_credits(token, reservation_id)
+                                        else:
+                                            credit_result, credit_error = release_credits(token, reservation_id)
+                                
+                                if extraction is not None:
+                                    credit_result, credit_error, extraction_status = extraction.result()
+                                    if credit_result and not credit_error:
+                                        st.session_state.llm_extraction = credit_result.get('data')
+                                    elif elements:
+                                        st.warning(f"⚠️ AI extraction unavailable: {credit_error}")
+                                        # Only a 4xx is known to come before the credit check; after a timeout or
+                                        # 5xx the credit may already be spent, so the local result is not metered again
+                                        if extraction_status is not None and 400 <= extraction_status < 500:
+                                            reservation, credit_error = reserve_credits(token, uploaded_file.name)
+                                            if not credit_error:
+                                                credit_result, credit_error = commit_credits(token, reservation['reservation_id'])
+                                
+                                if credit_result and 'credits_remaining' in credit_result:
+                                    st.session_state.credits = credit_result['credits_remaining']
+                                if credit_error:
+                                    st.warning(f"⚠️ Credit service: {credit_error}")
+                            
+                            if elements:
+                                if credit_result and 'credits_remaining' in credit_result:
+                                    st.info(f"💳 Credit used! Remaining credits: {credit_result['credits_remaining']}")
                                 
                                 st.session_state.processed_elements = elements
                                 
@@ -813,21 +1083,9 @@ def main():
                                 })
                                 
                                 # Apply schema or create standard output
-                                if st.session_state.schema_fields:
-                                    schema_output = apply_custom_schema(elements, st.session_state.schema_fields)
-                                    if schema_output:
-                                        st.session_state.final_json = schema_output
-                                else:
-                                    standard_output = {
-                                        "metadata": {
-                                            "total_elements": len(elements),
-                                            "processing_timestamp": pd.Timestamp.now().isoformat(),
-                                            "filename": uploaded_file.name,
-                                            "processing_options": processing_options
-                                        },
-                                        "elements": [element.to_dict() for element in elements]
-                                    }
-                                    st.session_state.final_json = standard_output
+                                final_json = build_final_output(elements, uploaded_file.name, processing_options)
+                                if final_json:
+                                    st.session_state.final_json = final_json
                                 
                                 st.success("🎉 Document processed successfully!")
                                 st.balloons()
@@ -987,64 +1245,68 @@ def main():
                 )
             
             with view_col2:
-                if 'content' in st.session_state.final_json:
-                    max_elements = len(st.session_state.final_json['content'])
-                    if max_elements > 1:
-                        elements_to_show = st.slider(
-                            "Elements to Display", 
-                            1, min(max_elements, 100), 
-                            min(10, max_elements)
-                        )
-                    else:
-                        elements_to_show = max_elements
-                        st.info(f"Showing {max_elements} element(s)")
-                else:
-                    elements_to_show = 10
+                page_size = st.selectbox("📑 Elements per Page", VIEWER_PAGE_SIZES)
             
             with view_col3:
+                element_filter = "All"
+                page_filter = "All"
                 if st.session_state.processed_elements:
+                    element_table = get_element_table(st.session_state.processed_elements)
                     element_filter = st.selectbox(
                         "🔍 Filter by Type",
-                        ["All"] + list(set([elem.to_dict().get('type', 'Unknown') for elem in st.session_state.processed_elements]))
+                        ["All"] + element_table.type_names
                     )
-                else:
-                    element_filter = "All"
+                    if element_table.page_counts:
+                        page_filter = st.selectbox(
+                            "📄 Filter by Page",
+                            ["All"] + list(element_table.page_counts)
+                        )
             
             st.markdown("---")
             
+            # Each mode shows one page of rows from a cursor; the viewer resets to the
+            # first page whenever the result, mode, filters or page size change
+            final_json = st.session_state.final_json
+            json_rows = final_json.get(rows_key(final_json) or 'content', [])
+            view_key = (id(final_json), view_mode, element_filter, page_filter, page_size)
+            
             # Display based on view mode
             if view_mode == "Element Cards":
                 st.markdown("#### 🎴 Element Cards View")
                 
                 if st.session_state.processed_elements:
-                    filtered_elements = st.session_state.processed_elements
-                    if element_filter != "All":
-                        filtered_elements = [
-                            elem for elem in st.session_state.processed_elements 
-                            if elem.to_dict().get('type', 'Unknown') == element_filter
-                        ]
+                    element_table = get_element_table(st.session_state.processed_elements)
+                    positions = element_table.positions(
+                        element_type=None if element_filter == "All" else element_filter,
+                        page_number=None if page_filter == "All" else page_filter
+                    )
                     
-                    elements_subset = filtered_elements[:elements_to_show]
-                    render_element_cards(elements_subset)
+                    pager, caption_slot = start_viewer_page(len(positions), page_size, view_key)
+                    # Cards show at most 500 characters of text plus a few hundred bytes of markup
+                    page_positions = pager.fit_rows(
+                        positions, lambda position: min(len(element_table.texts[position]), 500) + 300
+                    )
+                    render_element_cards(element_table.rows(page_positions), start=pager.cursor)
+                    finish_viewer_page(pager, caption_slot)
                 else:
                     st.info("No processed elements available")
             
             elif view_mode == "JSON Viewer":
                 st.markdown("#### 🔍 JSON Viewer")
                 
-                # Limit JSON for display
-                display_json = st.session_state.final_json.copy()
-                if 'content' in display_json:
-                    display_json['content'] = display_json['content'][:elements_to_show]
-                
-                render_json_viewer(display_json)
+                pager, caption_slot = start_viewer_page(len(json_rows), page_size, view_key)
+                render_json_viewer(final_json, pager)
+                finish_viewer_page(pager, caption_slot)
             
             elif view_mode == "Table View":
                 st.markdown("#### 📋 Table View")
                 
                 if 'content' in st.session_state.final_json:
                     try:
-                        df = pd.json_normalize(st.session_state.final_json['content'][:elements_to_show])
+                        pager, caption_slot = start_viewer_page(len(json_rows), page_size, view_key)
+                        page_rows = pager.fit_rows(json_rows, lambda row: len(json.dumps(row, default=str)))
+                        finish_viewer_page(pager, caption_slot)
+                        df = pd.json_normalize(page_rows)
                         
                         # Clean up column names
                         df.columns = [col.replace('metadata.', '').replace('_', ' ').title() for col in df.columns]
@@ -1081,7 +1343,16 @@ def main():
             
             elif view_mode == "Raw Data":
                 st.markdown("#### 🗂️ Raw Data View")
-                st.json(st.session_state.final_json)
+                
+                key = rows_key(final_json)
+                if key:
+                    pager, caption_slot = start_viewer_page(len(json_rows), page_size, view_key)
+                    raw_page = {name: value for name, value in final_json.items() if name != key}
+                    raw_page[key] = pager.fit_rows(json_rows, lambda row: len(json.dumps(row, default=str)))
+                    st.json(raw_page)
+                    finish_viewer_page(pager, caption_slot)
+                else:
+                    st.json(final_json)
             
             # Download section
             st.markdown("---")
@@ -1090,15 +1361,21 @@ def main():
             col_down1, col_down2, col_down3 = st.columns(3)
             
             with col_down1:
-                # JSON Download
-                json_str = json.dumps(st.session_state.final_json, indent=2)
-                st.download_button(
-                    label="📥 Download JSON",
-                    data=json_str,
-                    file_name=f"processed_{st.session_state.current_file_info.get('name', 'document').split('.')[0]}.json",
-                    mime="application/json",
-                    use_container_width=True
-                )
+                # JSON Download, encoded only when requested and then reused across reruns
+                compress_json = st.checkbox("🗜️ Gzip JSON", value=False)
+                json_export = get_json_export(st.session_state.final_json, compress_json)
+                if json_export is None and st.button("📦 Prepare JSON", use_container_width=True):
+                    with st.spinner("Encoding JSON export..."):
+                        json_export = prepare_json_export(st.session_state.final_json, compress_json)
+                
+                if json_export:
+                    st.download_button(
+                        label=f"📥 Download JSON ({json_export.size / 1024:,.0f} KB)",
+                        data=json_export.read(),
+                        file_name=json_export.file_name(f"processed_{st.session_state.current_file_info.get('name', 'document').split('.')[0]}"),
+                        mime=json_export.mime,
+                        use_container_width=True
+                    )
             
             with col_down2:
                 # CSV Download
@@ -1153,7 +1430,10 @@ def main():
         st.markdown("### 📈 Analytics Dashboard")
         
         if st.session_state.final_json:
-            create_analytics_dashboard(st.session_state.final_json)
+            create_analytics_dashboard(
+                st.session_state.final_json,
+                get_element_table(st.session_state.processed_elements) if st.session_state.processed_elements else None
+            )
             
             # Additional analytics
             if 'content' in st.session_state.final_json:
@@ -1186,11 +1466,14 @@ def main():
                 with col_stats2:
                     st.markdown("##### 🏷️ Element Analysis")
                     
-                    # Element type analysis
-                    element_types = {}
-                    for item in content:
-                        elem_type = item.get('type', 'Unknown')
-                        element_types[elem_type] = element_types.get(elem_type, 0) + 1
+                    # Element type analysis, from the type index when the table backs this output
+                    if st.session_state.processed_elements and len(st.session_state.processed_elements) == len(content):
+                        element_types = get_element_table(st.session_state.processed_elements).type_counts
+                    else:
+                        element_types = {}
+                        for item in content:
+                            elem_type = item.get('type', 'Unknown')
+                            element_types[elem_type] = element_types.get(elem_type, 0) + 1
                     
                     # Create a more detailed breakdown
                     for elem_type, count in sorted(element_types.items(), key=lambda x: x[1], reverse=True):
@@ -1,16 +1,23 @@
+import os
 import streamlit as st
-import requests
 
-# AWS Configuration
-API_ENDPOINT = "https://i4a8p9jm70.execute-api.us-east-1.amazonaws.com/prod"
+from http_client import HTTP_CONNECT_TIMEOUT, ApiClient
+
+# AWS Configuration (endpoints can be overridden to point at a local stub)
+API_ENDPOINT = os.getenv('API_ENDPOINT', "https://i4a8p9jm70.execute-api.us-east-1.amazonaws.com/prod")
 USER_POOL_CLIENT_ID = "lq7a32rt0stetm9sfdljnhs3b"
-COGNITO_ENDPOINT = "https://cognito-idp.us-east-1.amazonaws.com/"
+COGNITO_ENDPOINT = os.getenv('COGNITO_ENDPOINT', "https://cognito-idp.us-east-1.amazonaws.com/")
+UPLOAD_READ_TIMEOUT = float(os.getenv('UPLOAD_READ_TIMEOUT', '300'))
+
+# Shared by every session so repeated calls reuse pooled keep-alive connections
+api_client = ApiClient()
 
 def cognito_login(email, password):
     """Login with AWS Cognito"""
     try:
-        response = requests.post(
+        response = api_client.post(
             COGNITO_ENDPOINT,
+            name='cognito InitiateAuth',
             headers={
                 'Content-Type': 'application/x-amz-json-1.1',
                 'X-Amz-Target': 'AWSCognitoIdentityProviderService.InitiateAuth'
@@ -36,7 +43,7 @@ def cognito_login(email, password):
 def register_user(email, password, name):
     """Register new user"""
     try:
-        response = requests.post(
+        response = api_client.post(
             f"{API_ENDPOINT}/v1/register",
             headers={'Content-Type': 'application/json'},
             json={'email': email, 'password': password, 'name': name}
@@ -49,8 +56,9 @@ def register_user(email, password, name):
 def verify_email(email, code):
     """Verify email with code"""
     try:
-        response = requests.post(
+        response = api_client.post(
             COGNITO_ENDPOINT,
+            name='cognito ConfirmSignUp',
             headers={
                 'Content-Type': 'application/x-amz-json-1.1',
                 'X-Amz-Target': 'AWSCognitoIdentityProviderService.ConfirmSignUp'
@@ -68,7 +76,7 @@ def verify_email(email, code):
 def get_credits(token):
     """Get user credits from API"""
     try:
-        response = requests.get(
+        response = api_client.get(
             f"{API_ENDPOINT}/v1/credits",
             headers={'Authorization': f'Bearer {token}'}
         )
@@ -77,32 +85,108 @@ def get_credits(token):
     except Exception as e:
         return 0, '', ''
 
-def process_document_with_credit(token, file_content, filename):
-    """Process document and automatically deduct credit"""
+def upload_document(token, file_content, filename):
+    """Upload raw file bytes to S3 through a presigned POST and return the object key"""
     try:
-        import base64
-        base64_file = base64.b64encode(file_content).decode('utf-8')
-        response = requests.post(
-            f"{API_ENDPOINT}/v1/process",
+        response = api_client.post(
+            f"{API_ENDPOINT}/v1/uploads",
             headers={
                 'Authorization': f'Bearer {token}',
                 'Content-Type': 'application/json'
             },
-            json={
-                'file': base64_file,
-                'filename': filename
-            }
+            json={'filename': filename}
         )
         data = response.json()
+        if not response.ok:
+            return None, data.get('error', 'Could not get an upload URL')
         
-        # Update credits in session
-        if 'credits_remaining' in data:
-            st.session_state.credits = data['credits_remaining']
+        # The file must be the last form field
+        upload = api_client.post(
+            data['upload_url'],
+            name='POST s3 upload',
+            timeout=(HTTP_CONNECT_TIMEOUT, UPLOAD_READ_TIMEOUT),
+            data=data['upload_fields'],
+            files={'file': (filename, file_content)}
+        )
+        if not upload.ok:
+            return None, f'Upload failed with status {upload.status_code}'
+        
+        return data['s3_key'], None
+    except Exception as e:
+        return None, str(e)
+
+def request_document_processing(token, file_content, filename, direct_upload=True):
+    """Send a document to the processing API, which deducts one credit
+
+    With direct_upload the file goes to S3 as raw bytes and only its key is sent
+    for processing; otherwise it is base64-encoded into the request body. Does
+    not touch session state, so it can run off the script thread. Returns
+    (data, error, status_code); status_code is None when no response arrived,
+    in which case the credit may or may not have been deducted.
+    """
+    try:
+        if direct_upload:
+            s3_key, error = upload_document(token, file_content, filename)
+            if error:
+                return None, error, None
+            payload = {'s3_key': s3_key}
+        else:
+            import base64
+            payload = {
+                'file': base64.b64encode(file_content).decode('utf-8'),
+                'filename': filename
+            }
         
-        return data, None
+        response = api_client.post(
+            f"{API_ENDPOINT}/v1/process",
+            headers={
+                'Authorization': f'Bearer {token}',
+                'Content-Type': 'application/json'
+            },
+            json=payload
+        )
+        data = response.json()
+        return data, None if response.ok else data.get('error', 'Processing failed'), response.status_code
+    except Exception as e:
+        return None, str(e), None
+
+def process_document_with_credit(token, file_content, filename, direct_upload=True):
+    """Process document and automatically deduct credit"""
+    data, error, _ = request_document_processing(token, file_content, filename, direct_upload)
+    
+    # Update credits in session
+    if data and 'credits_remaining' in data:
+        st.session_state.credits = data['credits_remaining']
+    
+    return data, error
+
+def _credits_request(token, action, payload):
+    try:
+        response = api_client.post(
+            f"{API_ENDPOINT}/v1/credits/{action}",
+            headers={
+                'Authorization': f'Bearer {token}',
+                'Content-Type': 'application/json'
+            },
+            json=payload
+        )
+        data = response.json()
+        return data, None if response.ok else data.get('error', f'Credit {action} failed')
     except Exception as e:
         return None, str(e)
 
+def reserve_credits(token, filename, credits=1):
+    """Hold credits for a document before processing it locally"""
+    return _credits_request(token, 'reserve', {'filename': filename, 'credits': credits})
+
+def commit_credits(token, reservation_id):
+    """Spend held credits once processing succeeded"""
+    return _credits_request(token, 'commit', {'reservation_id': reservation_id})
+
+def release_credits(token, reservation_id):
+    """Return held credits when processing failed"""
+    return _credits_request(token, 'release', {'reservation_id': reservation_id})
+
 def is_authenticated():
     """Check if user is authenticated"""
     return st.session_state.get('authenticated', False)
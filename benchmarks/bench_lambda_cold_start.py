@@ -0,0 +1,170 @@
+"""Measure process_document Lambda cold start: module import and first invoke
+
+Each trial runs in a fresh interpreter against a local stand-in for DynamoDB,
+S3 and Bedrock (boto3 >= 1.28 honours AWS_ENDPOINT_URL), so no AWS account is
+needed. Pass --max-import-ms / --max-invoke-ms to fail on a regression.
+
+Usage: python benchmarks/bench_lambda_cold_start.py [--trials 5] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LAMBDA_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'terraform', 'lambda_functions'
+)
+
+# user_id -> credits returned by the stand-in users table
+STAND_IN_CREDITS = {'user-with-credits': 10, 'user-without-credits': 0}
+
+# name -> (user_id, filename, expected statusCode)
+SCENARIOS = {
+    'no_credits': ('user-without-credits', 'notes.txt', 429),
+    'txt': ('user-with-credits', 'notes.txt', 200),
+}
+
+TRIAL_SCRIPT = """
+import base64, json, sys, time
+start = time.perf_counter()
+import process_document
+imported = time.perf_counter()
+user_id, filename = sys.argv[1], sys.argv[2]
+event = {
+    'requestContext': {'authorizer': {'jwt': {'claims': {'sub': user_id}}}},
+    'body': json.dumps({'file': base64.b64encode(b'Quarterly report\\n' * 50).decode(), 'filename': filename}),
+}
+response = process_document.handler(event, None)
+invoked = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'invoke_ms': (invoked - imported) * 1000,
+    'status': response['statusCode'],
+}))
+"""
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Just enough of the DynamoDB, S3 and Bedrock wire protocols for the handler"""
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, payload, content_type='application/x-amz-json-1.0'):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def do_POST(self):
+        request = self._read_body()
+        target = self.headers.get('X-Amz-Target', '')
+        if target.endswith('.GetItem'):
+            user_id = json.loads(request)['Key']['user_id']['S']
+            credits = STAND_IN_CREDITS.get(user_id)
+            if credits is None:
+                self._reply({})
+            else:
+                self._reply({'Item': {'user_id': {'S': user_id}, 'credits': {'N': str(credits)}}})
+        elif target:
+            self._reply({})
+        else:
+            # Bedrock InvokeModel
+            self._reply(
+                {'content': [{'text': '{"document_type": "report"}'}]},
+                content_type='application/json'
+            )
+
+    def do_PUT(self):
+        # S3 PutObject
+        self._read_body()
+        self.send_response(200)
+        self.send_header('ETag', '"stand-in"')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+def start_stand_in():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_trial(endpoint_url, user_id, filename):
+    env = {
+        **os.environ,
+        'AWS_ENDPOINT_URL': endpoint_url,
+        'AWS_ACCESS_KEY_ID': 'stand-in',
+        'AWS_SECRET_ACCESS_KEY': 'stand-in',
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        'USERS_TABLE': 'users',
+        'USAGE_TABLE': 'usage',
+        'DOCUMENTS_TABLE': 'documents',
+        'BUCKET_NAME': 'documents-bucket',
+        'PYTHONPATH': os.pathsep.join(filter(None, [LAMBDA_DIR, os.environ.get('PYTHONPATH')])),
+        'PYTHONDONTWRITEBYTECODE': '1',
+    }
+    output = subprocess.run(
+        [sys.executable, '-c', TRIAL_SCRIPT, user_id, filename],
+        env=env, cwd=LAMBDA_DIR, capture_output=True, text=True, check=True
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--trials', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--max-import-ms', type=float, help='fail if median import time exceeds this')
+    parser.add_argument('--max-invoke-ms', type=float, help='fail if any median first invoke exceeds this')
+    args = parser.parse_args()
+
+    server = start_stand_in()
+    endpoint_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    results = {}
+    failures = []
+    try:
+        for name, (user_id, filename, expected_status) in SCENARIOS.items():
+            trials = [run_trial(endpoint_url, user_id, filename) for _ in range(args.trials)]
+            statuses = {trial['status'] for trial in trials}
+            if statuses != {expected_status}:
+                failures.append(f"{name}: expected status {expected_status}, got {sorted(statuses)}")
+            results[name] = {
+                'import_ms': round(statistics.median(t['import_ms'] for t in trials), 1),
+                'invoke_ms': round(statistics.median(t['invoke_ms'] for t in trials), 1),
+            }
+    finally:
+        server.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"trials:       {args.trials} (median, fresh interpreter each)")
+        for name, timings in results.items():
+            print(f"{name + ':':<13} import {timings['import_ms']:.1f} ms, first invoke {timings['invoke_ms']:.1f} ms")
+
+    import_ms = max(timings['import_ms'] for timings in results.values())
+    invoke_ms = max(timings['invoke_ms'] for timings in results.values())
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        failures.append(f"import {import_ms:.1f} ms exceeds {args.max_import_ms:.1f} ms")
+    if args.max_invoke_ms is not None and invoke_ms > args.max_invoke_ms:
+        failures.append(f"first invoke {invoke_ms:.1f} ms exceeds {args.max_invoke_ms:.1f} ms")
+
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""Compare the per-element schema loop with the compiled columnar projection
+
+Usage: python benchmarks/bench_schema_projection.py [--elements 100000] [--fields 30] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schema_projection import SchemaProjection, element_type_counts
+
+FIELD_TYPES = [
+    'extracted_text', 'element_type', 'page_number', 'coordinates', 'text_length',
+    'word_count', 'parent_id', 'filename', 'custom', 'string',
+]
+ELEMENT_TYPES = ['Title', 'NarrativeText', 'ListItem', 'Table', 'PageBreak']
+
+
+def reference_apply_schema(element_dicts, schema_fields):
+    """The per-element, per-field loop apply_custom_schema used before compilation"""
+    element_types = {}
+    for element_dict in element_dicts:
+        elem_type = element_dict.get("type", "unknown")
+        element_types[elem_type] = element_types.get(elem_type, 0) + 1
+
+    content = []
+    for idx, element_dict in enumerate(element_dicts):
+        processed_element = {
+            "element_id": element_dict.get("element_id", f"elem_{idx}"),
+            "type": element_dict.get("type", ""),
+            "text": element_dict.get("text", ""),
+            "metadata": element_dict.get("metadata", {})
+        }
+
+        for field in schema_fields:
+            if field['field_name']:
+                field_type = field['field_type']
+
+                if field_type == 'extracted_text':
+                    processed_element[field['field_name']] = element_dict.get("text", "")
+                elif field_type == 'element_type':
+                    processed_element[field['field_name']] = element_dict.get("type", "")
+                elif field_type == 'page_number':
+                    processed_element[field['field_name']] = element_dict.get("metadata", {}).get("page_number", None)
+                elif field_type == 'coordinates':
+                    processed_element[field['field_name']] = element_dict.get("metadata", {}).get("coordinates", None)
+                elif field_type == 'text_length':
+                    processed_element[field['field_name']] = len(element_dict.get("text", ""))
+                elif field_type == 'word_count':
+                    processed_element[field['field_name']] = len(element_dict.get("text", "").split())
+                elif field_type == 'parent_id':
+                    processed_element[field['field_name']] = element_dict.get("metadata", {}).get("parent_id", None)
+                elif field_type == 'filename':
+                    processed_element[field['field_name']] = element_dict.get("metadata", {}).get("filename", None)
+                elif field_type == 'custom':
+                    processed_element[field['field_name']] = f"Custom field: {field['description']}"
+
+        content.append(processed_element)
+    return content, element_types
+
+
+def compiled_apply_schema(element_dicts, schema_fields):
+    return SchemaProjection(schema_fields).project(element_dicts), element_type_counts(element_dicts)
+
+
+def build_element_dicts(count, seed=0):
+    rng = random.Random(seed)
+    words = "the quarterly revenue grew by twelve percent year over year".split()
+    element_dicts = []
+    for idx in range(count):
+        metadata = {'filename': 'report.pdf', 'page_number': idx // 40 + 1}
+        if rng.random() < 0.5:
+            metadata['parent_id'] = f"parent_{idx // 10}"
+        element_dict = {
+            'type': rng.choice(ELEMENT_TYPES),
+            'text': ' '.join(rng.choice(words) for _ in range(rng.randint(0, 40))),
+            'metadata': metadata,
+        }
+        # Some elements lack an id so the elem_<idx> fallback is exercised
+        if rng.random() < 0.9:
+            element_dict['element_id'] = f"{idx:032x}"
+        element_dicts.append(element_dict)
+    return element_dicts
+
+
+def build_schema(field_count, seed=0):
+    rng = random.Random(seed)
+    fields = [
+        {
+            'field_name': f"field_{idx}",
+            'field_type': FIELD_TYPES[idx % len(FIELD_TYPES)],
+            'description': f"Field {idx}",
+            'required': False,
+        }
+        for idx in range(field_count)
+    ]
+    # Duplicate names, blank names and base-key overrides follow the loop's semantics too
+    fields.append({'field_name': 'text', 'field_type': 'word_count', 'description': '', 'required': False})
+    fields.append({'field_name': '', 'field_type': 'extracted_text', 'description': '', 'required': False})
+    fields.append(dict(rng.choice(fields[:field_count]), field_type='text_length'))
+    return fields
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--elements', type=int, default=100000)
+    parser.add_argument('--fields', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    element_dicts = build_element_dicts(args.elements)
+    schema_fields = build_schema(args.fields)
+
+    reference_time, reference = best_of(lambda: reference_apply_schema(element_dicts, schema_fields), args.repeat)
+    compiled_time, compiled = best_of(lambda: compiled_apply_schema(element_dicts, schema_fields), args.repeat)
+
+    identical = (
+        reference[1] == compiled[1]
+        and list(reference[1]) == list(compiled[1])
+        and all(
+            ref == new and list(ref) == list(new)
+            for ref, new in zip(reference[0], compiled[0])
+        )
+        and len(reference[0]) == len(compiled[0])
+    )
+
+    print(f"elements:     {args.elements:,} x {len(schema_fields)} fields")
+    print(f"per-element:  {reference_time * 1000:.1f} ms")
+    print(f"compiled:     {compiled_time * 1000:.1f} ms")
+    print(f"speedup:      {reference_time / compiled_time:.1f}x")
+    print(f"identical:    {identical}")
+
+    if not identical:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Compare the per-element and batched text cleaning stages
+
+Usage: python benchmarks/bench_text_cleaning.py [--elements 50000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unstructured.documents.elements import ListItem, NarrativeText, Title
+
+from text_cleaning import clean_elements_batch, iter_clean_elements
+
+SAMPLE_TEXTS = [
+    "  Quarterly   revenue grew\n by 12%\xa0year over year.  ",
+    "• Reduced onboarding time from 3 weeks to 4 days",
+    "RESULTS AND DISCUSSION",
+    "Café naïve résumé – coöperate",
+    "- bullet with   extra    spaces",
+    "ok",
+    "",
+]
+
+PROCESSING_OPTIONS = {
+    'clean_text': True,
+    'clean_non_ascii': True,
+    'clean_bullets': True,
+    'min_text_length': 10,
+}
+
+
+def build_elements(count, seed=0):
+    rng = random.Random(seed)
+    element_types = [NarrativeText, Title, ListItem]
+    return [
+        rng.choice(element_types)(text=rng.choice(SAMPLE_TEXTS) * rng.randint(1, 4))
+        for _ in range(count)
+    ]
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--elements', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    elements = build_elements(args.elements)
+
+    per_element_time, per_element = best_of(
+        lambda: list(iter_clean_elements(elements, PROCESSING_OPTIONS)), args.repeat
+    )
+    batch_time, batch = best_of(
+        lambda: clean_elements_batch(elements, PROCESSING_OPTIONS), args.repeat
+    )
+
+    identical = [(type(e), e.text) for e in per_element] == [(type(e), e.text) for e in batch]
+
+    print(f"elements:     {args.elements:,}")
+    print(f"per-element:  {per_element_time * 1000:.1f} ms")
+    print(f"batched:      {batch_time * 1000:.1f} ms")
+    print(f"speedup:      {per_element_time / batch_time:.1f}x")
+    print(f"identical:    {identical}")
+
+    if not identical:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,9 +3,13 @@ import boto3
 import os
 from datetime import datetime
 
+from metering import UsageMeter
+
 stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
-dynamodb = boto3.resource('dynamodb')
+# DYNAMODB_ENDPOINT_URL points at DynamoDB Local for testing without AWS
+dynamodb = boto3.resource('dynamodb', endpoint_url=os.getenv('DYNAMODB_ENDPOINT_URL'))
 usage_table = dynamodb.Table(os.getenv('USAGE_TABLE', 'api-usage'))
+usage_meter = UsageMeter(usage_table)
 
 PRICING_PLANS = {
     "free": {"limit": 100, "price": 0},
@@ -14,6 +18,13 @@ PRICING_PLANS = {
     "enterprise": {"limit": 1000000, "price": 499, "price_id": "price_enterprise"}
 }
 
+# Callbacks run with the user_id after a plan change, e.g. to drop cached API key records
+_plan_change_listeners = []
+
+def on_plan_change(callback):
+    """Register a callback to run with the user_id whenever a user's plan changes"""
+    _plan_change_listeners.append(callback)
+
 def create_customer(email: str, user_id: str):
     """Create Stripe customer"""
     customer = stripe.Customer.create(email=email, metadata={"user_id": user_id})
@@ -41,11 +52,9 @@ def upgrade_plan(user_id: str, new_plan: str):
             ':time': datetime.utcnow().isoformat()
         }
     )
+    for callback in _plan_change_listeners:
+        callback(user_id)
 
 def track_usage(api_key: str, units: int = 1):
-    """Track API usage for billing"""
-    usage_table.update_item(
-        Key={'api_key': api_key},
-        UpdateExpression='SET usage = usage + :inc',
-        ExpressionAttributeValues={':inc': units}
-    )
+    """Track API usage for billing; buffered and flushed to the table by usage_meter"""
+    usage_meter.record(api_key, units)
@@ -0,0 +1,93 @@
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Sequence
+
+from schema_projection import SchemaProjection
+
+
+class ElementTable:
+    """Processed elements converted to dicts once, plus the columns the views read
+
+    Built once per processing run and shared by the schema projection, the
+    standard output and the results views, so Streamlit reruns don't call
+    to_dict() on every element again. Dicts are shared, not copied; treat
+    them as read-only.
+    """
+
+    def __init__(self, elements: List[Any]):
+        self.elements = elements
+        self.dicts: List[Dict[str, Any]] = [
+            element.to_dict() if hasattr(element, 'to_dict') else element
+            for element in elements
+        ]
+        # element_id, type, text and metadata columns, in the schema projection's layout
+        self.columns: Dict[str, List[Any]] = SchemaProjection.base_columns(self.dicts)
+
+    def __len__(self) -> int:
+        return len(self.dicts)
+
+    @property
+    def types(self) -> List[str]:
+        return self.columns['type']
+
+    @property
+    def texts(self) -> List[str]:
+        return self.columns['text']
+
+    @property
+    def element_ids(self) -> List[Any]:
+        return self.columns['element_id']
+
+    @cached_property
+    def page_numbers(self) -> List[Any]:
+        return [metadata.get('page_number') for metadata in self.columns['metadata']]
+
+    @cached_property
+    def type_index(self) -> Dict[str, List[int]]:
+        """Element type -> row positions, in document order"""
+        index: Dict[str, List[int]] = {}
+        for position, element_dict in enumerate(self.dicts):
+            index.setdefault(element_dict.get('type', 'Unknown'), []).append(position)
+        return index
+
+    @cached_property
+    def page_index(self) -> Dict[Any, List[int]]:
+        """Page number -> row positions, in document order; elements without a page are left out"""
+        index: Dict[Any, List[int]] = {}
+        for position, page_number in enumerate(self.page_numbers):
+            if page_number is not None:
+                index.setdefault(page_number, []).append(position)
+        return index
+
+    @cached_property
+    def type_names(self) -> List[str]:
+        """Distinct element types, sorted"""
+        return sorted(self.type_index)
+
+    @cached_property
+    def type_counts(self) -> Dict[str, int]:
+        """Element count per type, in first-seen order"""
+        return {element_type: len(positions) for element_type, positions in self.type_index.items()}
+
+    @cached_property
+    def page_counts(self) -> Dict[Any, int]:
+        """Element count per page, in page order"""
+        return {page: len(self.page_index[page]) for page in sorted(self.page_index)}
+
+    def positions(self, element_type: Optional[str] = None, page_number: Any = None) -> Sequence[int]:
+        """Row positions matching the filters, read from the indexes instead of scanning"""
+        if element_type is None and page_number is None:
+            return range(len(self.dicts))
+        if page_number is None:
+            return self.type_index.get(element_type, [])
+        on_page = self.page_index.get(page_number, [])
+        if element_type is None:
+            return on_page
+        # Pages are small, so check the type of each element on the page
+        dicts = self.dicts
+        return [position for position in on_page if dicts[position].get('type', 'Unknown') == element_type]
+
+    def rows(self, positions: Sequence[int], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Element dicts at the given positions, up to limit"""
+        if limit is not None:
+            positions = positions[:limit]
+        return [self.dicts[position] for position in positions]
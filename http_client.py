@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from http.cookiejar import DefaultCookiePolicy
+from typing import Any, Dict, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3.05'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '30'))
+HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', '2'))
+HTTP_BACKOFF_FACTOR = float(os.getenv('HTTP_BACKOFF_FACTOR', '0.3'))
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '10'))
+
+# Only methods that are safe to repeat are retried after the request was sent;
+# connection failures are retried for every method since nothing reached the server
+RETRY_METHODS = frozenset({'GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'})
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+class ApiClient:
+    """Shared HTTP client with connection pooling, timeouts, retries and latency stats
+
+    One instance is meant to be shared by every Streamlit session in the
+    process, so cookies are never stored; callers authenticate with headers.
+    """
+
+    def __init__(
+        self,
+        timeout: Timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+        retries: int = HTTP_RETRIES,
+        backoff_factor: float = HTTP_BACKOFF_FACTOR,
+        pool_size: int = HTTP_POOL_SIZE,
+        latency_window: int = 200,
+    ):
+        self.timeout = timeout
+        self.latency_window = latency_window
+        self.session = requests.Session()
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=RETRY_METHODS,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._latencies: Dict[str, deque] = defaultdict(lambda: deque(maxlen=self.latency_window))
+        self._calls: Dict[str, int] = defaultdict(int)
+        self._errors: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def request(self, method: str, url: str, name: Optional[str] = None,
+                timeout: Optional[Timeout] = None, **kwargs) -> requests.Response:
+        """Send a request, recording its latency under name (defaults to the method and path)"""
+        name = name or f"{method.upper()} {requests.utils.urlparse(url).path}"
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            failed = response.status_code >= 500
+            return response
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._calls[name] += 1
+                self._latencies[name].append(elapsed_ms)
+                if failed:
+                    self._errors[name] += 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request('PUT', url, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Call counts, errors and latency percentiles (ms, over the recent window) per endpoint"""
+        with self._lock:
+            stats = {}
+            for name, latencies in self._latencies.items():
+                ordered = sorted(latencies)
+                stats[name] = {
+                    'calls': self._calls[name],
+                    'errors': self._errors[name],
+                    'p50_ms': round(ordered[len(ordered) // 2], 1),
+                    'p95_ms': round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)], 1),
+                    'max_ms': round(ordered[-1], 1),
+                }
+            return stats
+
+    def close(self):
+        self.session.close()
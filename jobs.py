@@ -0,0 +1,159 @@
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+import time
+from dataclasses import dataclass, field, fields
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+JOB_QUEUED = 'queued'
+JOB_PROCESSING = 'processing'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+
+
+@dataclass
+class Job:
+    job_id: str
+    owner_id: str
+    filename: str
+    status: str = JOB_QUEUED
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    # Request payload, only held until a worker picks the job up
+    payload: Dict[str, Any] = field(default_factory=dict, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.name != 'payload'}
+
+
+class JobBackend(ABC):
+    """Storage for job records and results; subclass to persist somewhere other than memory"""
+
+    @abstractmethod
+    def save(self, job: Job):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_result(self, job_id: str, result: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_result(self, job_id: str) -> Optional[List[Dict[str, Any]]]:
+        raise NotImplementedError
+
+
+class InMemoryJobBackend(JobBackend):
+    """Process-local job storage that expires finished jobs after a TTL"""
+
+    def __init__(self, result_ttl_seconds: float = 3600):
+        self.result_ttl_seconds = result_ttl_seconds
+        self._jobs: Dict[str, Job] = {}
+        self._results: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def save(self, job: Job):
+        job.updated_at = time.time()
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._expire()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def save_result(self, job_id: str, result: List[Dict[str, Any]]):
+        with self._lock:
+            self._results[job_id] = result
+
+    def load_result(self, job_id: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            return self._results.get(job_id)
+
+    def _expire(self):
+        cutoff = time.time() - self.result_ttl_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.status in (JOB_COMPLETED, JOB_FAILED) and job.updated_at < cutoff
+        ]
+        for job_id in expired:
+            self._jobs.pop(job_id, None)
+            self._results.pop(job_id, None)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+class JobQueue:
+    """In-process job queue drained by a fixed pool of asyncio workers"""
+
+    def __init__(
+        self,
+        runner: Callable[[Job], Awaitable[List[Dict[str, Any]]]],
+        backend: Optional[JobBackend] = None,
+        workers: int = 2,
+        max_queued: int = 100,
+    ):
+        self.runner = runner
+        self.backend = backend or InMemoryJobBackend()
+        self.workers = workers
+        self.max_queued = max_queued
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, job: Job) -> Job:
+        await self.start()
+        if self._queue.full():
+            raise QueueFullError("Job queue is full")
+        self.backend.save(job)
+        self._queue.put_nowait(job.job_id)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.backend.get(job_id)
+
+    def get_result(self, job_id: str) -> Optional[List[Dict[str, Any]]]:
+        return self.backend.load_result(job_id)
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = self.backend.get(job_id)
+                if job is None:
+                    continue
+                job.status = JOB_PROCESSING
+                self.backend.save(job)
+                try:
+                    result = await self.runner(job)
+                    self.backend.save_result(job.job_id, result)
+                    job.status = JOB_COMPLETED
+                except Exception as e:
+                    job.status = JOB_FAILED
+                    job.error = str(e)
+                finally:
+                    job.payload = {}
+                    self.backend.save(job)
+            finally:
+                self._queue.task_done()
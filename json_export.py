@@ -0,0 +1,62 @@
+import gzip
+import json
+import os
+import tempfile
+from typing import Any, Dict, Iterator
+
+# Exports stay in memory up to this size, then spill to a temp file on disk
+EXPORT_SPOOL_MAX_BYTES = int(os.getenv('EXPORT_SPOOL_MAX_BYTES', str(8 * 1024 * 1024)))
+# Encoded output is buffered and written in chunks of about this many characters
+EXPORT_WRITE_CHUNK = int(os.getenv('EXPORT_WRITE_CHUNK', str(64 * 1024)))
+
+
+def iter_json_chunks(json_data: Dict[str, Any], indent: int = 2,
+                     chunk_size: int = EXPORT_WRITE_CHUNK) -> Iterator[str]:
+    """Pretty JSON for json_data, encoded incrementally and yielded in chunks
+
+    The concatenated chunks are identical to json.dumps(json_data, indent=indent),
+    but no more than about chunk_size characters are held at once.
+    """
+    buffer = []
+    buffered = 0
+    for piece in json.JSONEncoder(indent=indent).iterencode(json_data):
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+class JsonExport:
+    """A finished JSON export held in a spooled temp file, optionally gzipped"""
+
+    def __init__(self, json_data: Dict[str, Any], compress: bool = False,
+                 spool_max_bytes: int = EXPORT_SPOOL_MAX_BYTES):
+        # The result this export was encoded from, so a new result invalidates it
+        self.source = json_data
+        self.compress = compress
+        self.file = tempfile.SpooledTemporaryFile(max_size=spool_max_bytes, mode='w+b')
+        target = gzip.GzipFile(fileobj=self.file, mode='wb') if compress else self.file
+        for chunk in iter_json_chunks(json_data):
+            target.write(chunk.encode('utf-8'))
+        if compress:
+            # Closing the gzip stream writes its trailer and leaves the spool open
+            target.close()
+        self.size = self.file.tell()
+
+    @property
+    def mime(self) -> str:
+        return 'application/gzip' if self.compress else 'application/json'
+
+    def file_name(self, stem: str) -> str:
+        return f"{stem}.json.gz" if self.compress else f"{stem}.json"
+
+    def read(self) -> bytes:
+        self.file.seek(0)
+        return self.file.read()
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,260 @@
+import atexit
+import fcntl
+import glob
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional
+
+USAGE_FLUSH_INTERVAL = float(os.getenv('USAGE_FLUSH_INTERVAL', '5'))
+USAGE_FLUSH_THRESHOLD = int(os.getenv('USAGE_FLUSH_THRESHOLD', '500'))
+# Base path for journals; each process journals to <base>.<pid>.log
+USAGE_JOURNAL_PATH = os.getenv(
+    'USAGE_JOURNAL_PATH',
+    os.path.join(tempfile.gettempdir(), 'docuai_usage_journal')
+)
+
+logger = logging.getLogger(__name__)
+
+
+class UsageMeter:
+    """Write-behind usage metering for API keys
+
+    Increments are buffered in memory per API key and written to the usage
+    table as one aggregated update per key, either on a timer or once the
+    buffer reaches a size threshold. Once started, every increment is first
+    appended to a journal owned by this process, and start() adopts the
+    journals of processes that died without flushing (delivery is
+    at-least-once if a process dies mid-flush). A journal is owned through an
+    exclusive lock on its .lock file, held for the life of the process, so
+    live workers sharing the base path never replay each other's journals.
+
+    `table` only needs an `update_item` method, so a DynamoDB Local table or a
+    plain stand-in object works for local testing.
+    """
+
+    def __init__(
+        self,
+        table,
+        flush_interval: float = USAGE_FLUSH_INTERVAL,
+        flush_threshold: int = USAGE_FLUSH_THRESHOLD,
+        journal_path: Optional[str] = USAGE_JOURNAL_PATH,
+    ):
+        self.table = table
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.journal_base = journal_path
+        self.journal_path: Optional[str] = None
+
+        self._pending: Dict[str, int] = defaultdict(int)
+        # The batch a flush is currently writing; still unbilled until its updates land
+        self._in_flight: Dict[str, int] = {}
+        self._backlog_units = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._journal = None
+        self._owner_lock = None
+
+        self.flushes = 0
+        self.failed_writes = 0
+        self.units_flushed = 0
+        self.last_flush_latency_ms = 0.0
+        self.last_flush_at: Optional[float] = None
+
+    def _open_journal(self):
+        """Take ownership of this process's journal, then adopt journals of dead processes"""
+        journal_path = f"{self.journal_base}.{os.getpid()}.log"
+        while True:
+            owner_lock = open(f"{journal_path}.lock", 'a')
+            # Blocks only while another process adopts a stale journal left under this pid
+            fcntl.flock(owner_lock, fcntl.LOCK_EX)
+            if os.fstat(owner_lock.fileno()).st_nlink:
+                break
+            owner_lock.close()
+
+        # A journal left behind by a dead process with the same pid is replayed, not reused
+        leftover = self._read_journal(journal_path)
+        with self._lock:
+            for api_key, units in leftover.items():
+                self._pending[api_key] += units
+                self._backlog_units += units
+            self._owner_lock = owner_lock
+            self.journal_path = journal_path
+            self._journal = open(journal_path, 'w', encoding='utf-8')
+            # Increments recorded before start() were only buffered
+            for api_key, units in self._pending.items():
+                self._journal.write(f"{api_key}\t{units}\n")
+            self._journal.flush()
+        if os.path.exists(f"{journal_path}.flushing"):
+            os.unlink(f"{journal_path}.flushing")
+
+        for lock_path in glob.glob(f"{glob.escape(self.journal_base)}.*.log.lock"):
+            if lock_path != owner_lock.name:
+                self._adopt_journal(lock_path[:-len('.lock')])
+
+    def _adopt_journal(self, journal_path: str):
+        """Replay another process's journal if that process no longer holds its lock"""
+        try:
+            lock = open(f"{journal_path}.lock", 'r')
+        except FileNotFoundError:
+            return
+        with lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # Owner is alive
+            if os.fstat(lock.fileno()).st_nlink == 0:
+                return  # Another process adopted it first
+
+            adopted = self._read_journal(journal_path)
+            with self._lock:
+                for api_key, units in adopted.items():
+                    self._journal.write(f"{api_key}\t{units}\n")
+                    self._pending[api_key] += units
+                    self._backlog_units += units
+                self._journal.flush()
+
+            for path in (f"{journal_path}.flushing", journal_path, f"{journal_path}.lock"):
+                if os.path.exists(path):
+                    os.unlink(path)
+            if adopted:
+                logger.info("Adopted %d pending usage units from %s", sum(adopted.values()), journal_path)
+
+    @staticmethod
+    def _read_journal(journal_path: str) -> Dict[str, int]:
+        """Units per API key in a journal, including a flush that was interrupted mid-write"""
+        units_by_key: Dict[str, int] = defaultdict(int)
+        for path in (f"{journal_path}.flushing", journal_path):
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        api_key, _, units = line.rstrip('\n').rpartition('\t')
+                        if api_key and units.isdigit():
+                            units_by_key[api_key] += int(units)
+        return units_by_key
+
+    @property
+    def _flushing_path(self) -> str:
+        return f"{self.journal_path}.flushing"
+
+    def record(self, api_key: str, units: int = 1):
+        """Buffer a usage increment for an API key"""
+        with self._lock:
+            if self._journal is not None:
+                self._journal.write(f"{api_key}\t{units}\n")
+                self._journal.flush()
+            self._pending[api_key] += units
+            self._backlog_units += units
+            backlog = self._backlog_units
+
+        if backlog >= self.flush_threshold:
+            self.flush()
+
+    def pending(self, api_key: str) -> int:
+        """Units recorded for a key that have not reached the table yet"""
+        with self._lock:
+            return self._pending.get(api_key, 0) + self._in_flight.get(api_key, 0)
+
+    def flush(self) -> int:
+        """Write the buffered increments to the table, one update per API key"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch = dict(self._pending)
+                self._in_flight = batch
+                self._pending.clear()
+                self._backlog_units = 0
+                # The current journal now covers exactly this batch
+                if self._journal is not None:
+                    self._journal.close()
+                    os.replace(self.journal_path, self._flushing_path)
+                    self._journal = open(self.journal_path, 'a', encoding='utf-8')
+
+            start = time.perf_counter()
+            failed = {}
+            timestamp = datetime.utcnow().isoformat()
+            for api_key, units in batch.items():
+                try:
+                    self.table.update_item(
+                        Key={'api_key': api_key},
+                        # usage is a DynamoDB reserved word, so it goes through a placeholder
+                        UpdateExpression='SET #usage = #usage + :inc, last_used = :time',
+                        ExpressionAttributeNames={'#usage': 'usage'},
+                        ExpressionAttributeValues={':inc': units, ':time': timestamp}
+                    )
+                except Exception as e:
+                    logger.warning("Usage flush error for key ending %s: %s", api_key[-4:], e)
+                    failed[api_key] = units
+
+            with self._lock:
+                self._in_flight = {}
+                # Failed increments go back into the buffer and the live journal
+                for api_key, units in failed.items():
+                    self._pending[api_key] += units
+                    self._backlog_units += units
+                    if self._journal is not None:
+                        self._journal.write(f"{api_key}\t{units}\n")
+                if self._journal is not None:
+                    self._journal.flush()
+                    os.unlink(self._flushing_path)
+
+                self.flushes += 1
+                self.failed_writes += len(failed)
+                self.units_flushed += sum(batch.values()) - sum(failed.values())
+                self.last_flush_latency_ms = (time.perf_counter() - start) * 1000
+                self.last_flush_at = time.time()
+
+            return len(batch) - len(failed)
+
+    def start(self):
+        """Open the journal, replay orphaned ones and flush on a background timer until stop()"""
+        if self._thread is not None:
+            return
+        if self.journal_base and self._journal is None:
+            self._open_journal()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='usage-meter', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the timer and flush whatever is still buffered"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._lock:
+            if self._journal is not None and not self._pending:
+                # Everything reached the table, so nothing is left to replay
+                self._journal.close()
+                self._journal = None
+                for path in (self.journal_path, f"{self.journal_path}.lock"):
+                    if os.path.exists(path):
+                        os.unlink(path)
+                self._owner_lock.close()
+                self._owner_lock = None
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def metrics(self) -> Dict[str, float]:
+        """Backlog and flush statistics"""
+        with self._lock:
+            return {
+                'backlog_keys': len(self._pending),
+                'backlog_units': self._backlog_units,
+                'flushes': self.flushes,
+                'failed_writes': self.failed_writes,
+                'units_flushed': self.units_flushed,
+                'last_flush_latency_ms': round(self.last_flush_latency_ms, 2),
+                'last_flush_at': self.last_flush_at,
+            }
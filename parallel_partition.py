@@ -0,0 +1,135 @@
+import io
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_WORKERS = int(os.getenv('PARTITION_WORKERS', str(os.cpu_count() or 1)))
+MIN_PAGES_FOR_PARALLEL = int(os.getenv('PARALLEL_MIN_PAGES', '16'))
+
+
+def count_pdf_pages(file_bytes: bytes) -> int:
+    """Count the pages of a PDF without extracting any text"""
+    import PyPDF2
+
+    return len(PyPDF2.PdfReader(io.BytesIO(file_bytes)).pages)
+
+
+def plan_page_ranges(page_count: int, max_workers: int, pages_per_range: Optional[int] = None) -> List[Tuple[int, int]]:
+    """Split pages 1..page_count into contiguous (first_page, last_page) ranges"""
+    if pages_per_range is None:
+        pages_per_range = math.ceil(page_count / max(max_workers, 1))
+    pages_per_range = max(pages_per_range, 1)
+
+    return [
+        (first, min(first + pages_per_range - 1, page_count))
+        for first in range(1, page_count + 1, pages_per_range)
+    ]
+
+
+def split_pdf(file_bytes: bytes, page_ranges: List[Tuple[int, int]]) -> List[bytes]:
+    """Write each page range out as a standalone PDF"""
+    import PyPDF2
+
+    reader = PyPDF2.PdfReader(io.BytesIO(file_bytes))
+    parts = []
+    for first, last in page_ranges:
+        writer = PyPDF2.PdfWriter()
+        for page_index in range(first - 1, last):
+            writer.add_page(reader.pages[page_index])
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        parts.append(buffer.getvalue())
+    return parts
+
+
+def split_pdf_into_ranges(file_bytes: bytes, pages_per_range: int) -> List[Tuple[int, bytes]]:
+    """Split a PDF into (first_page, pdf_bytes) parts of at most pages_per_range pages"""
+    page_ranges = plan_page_ranges(count_pdf_pages(file_bytes), 1, pages_per_range)
+    return [(first, part) for (first, _), part in zip(page_ranges, split_pdf(file_bytes, page_ranges))]
+
+
+def partition_page_range(part_bytes: bytes, first_page: int, filename: str, partition_args: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Worker: partition one page range and rebase its metadata onto the whole document"""
+    from unstructured.documents.elements import assign_and_map_hash_ids
+    from unstructured.partition.auto import partition
+    from unstructured.staging.base import convert_to_dict
+
+    elements = partition(file=io.BytesIO(part_bytes), metadata_filename=filename, **partition_args)
+
+    for element in elements:
+        if element.metadata.page_number is not None:
+            element.metadata.page_number += first_page - 1
+
+    # IDs hash the page number and the element's position on its page, so once pages
+    # are absolute they match what a single-process run would produce
+    elements = assign_and_map_hash_ids(elements)
+
+    return convert_to_dict(elements)
+
+
+def partition_pdf_pages(
+    file_bytes: bytes,
+    filename: str,
+    partition_args: Dict[str, Any],
+    max_workers: int = DEFAULT_WORKERS,
+    min_pages: int = MIN_PAGES_FOR_PARALLEL,
+    pages_per_range: Optional[int] = None,
+) -> Optional[List]:
+    """Partition a PDF by fanning page ranges out to a process pool
+
+    Returns the merged elements in page order, or None when the document is too
+    small (or only one worker is configured) so the caller should use the
+    single-process path instead.
+    """
+    from unstructured.documents.elements import PageBreak, Title, assign_and_map_hash_ids
+    from unstructured.staging.base import dict_to_elements
+
+    if max_workers <= 1:
+        return None
+
+    page_count = count_pdf_pages(file_bytes)
+    if page_count < max(min_pages, 2):
+        return None
+
+    page_ranges = plan_page_ranges(page_count, max_workers, pages_per_range)
+    parts = split_pdf(file_bytes, page_ranges)
+
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(parts))) as executor:
+        results = list(executor.map(
+            partition_page_range,
+            parts,
+            [first for first, _ in page_ranges],
+            [filename] * len(parts),
+            [partition_args] * len(parts),
+        ))
+
+    elements = []
+    last_title_id = None
+    for range_index, element_dicts in enumerate(results):
+        range_elements = dict_to_elements(element_dicts)
+
+        if range_index > 0:
+            # Ranges are partitioned independently, so the page break between them is restored here
+            if partition_args.get('include_page_breaks'):
+                page_break = PageBreak(text="")
+                page_break.metadata.page_number = page_ranges[range_index][0] - 1
+                elements.append(page_break)
+
+            # Elements ahead of a range's first title had their section title in an earlier
+            # range; link them to it as the single-process hierarchy would
+            if last_title_id is not None:
+                for element in range_elements:
+                    if isinstance(element, Title):
+                        break
+                    if element.metadata.parent_id is None:
+                        element.metadata.parent_id = last_title_id
+
+        for element in range_elements:
+            if isinstance(element, Title):
+                last_title_id = element.id
+        elements.extend(range_elements)
+
+    # Re-hash every element over the merged document: IDs depend on each element's
+    # page and position on it, and parent_id references are remapped to the new IDs
+    return assign_and_map_hash_ids(elements)
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+DEFAULT_CACHE_DIR = os.getenv(
+    'PARTITION_CACHE_DIR',
+    os.path.join(tempfile.gettempdir(), 'docuai_partition_cache')
+)
+DEFAULT_MAX_BYTES = int(os.getenv('PARTITION_CACHE_MAX_MB', '512')) * 1024 * 1024
+
+CACHE_FILE_SUFFIX = '.json'
+
+
+class PartitionCache:
+    """Content-addressed, size-bounded LRU cache of partition results on local disk
+
+    Entries are keyed on a hash of the file bytes plus the normalized partition
+    arguments, and stored as unstructured's element JSON. Recency is tracked in
+    memory and persisted through file mtimes so the LRU order survives restarts.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        """Rebuild the LRU index from the files already on disk, oldest first"""
+        found = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(CACHE_FILE_SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            found.append((stat.st_mtime, name[:-len(CACHE_FILE_SUFFIX)], stat.st_size))
+
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{CACHE_FILE_SUFFIX}")
+
+    @staticmethod
+    def make_key(file_bytes, partition_args: Dict[str, Any]) -> str:
+        """Hash the document bytes together with the normalized partition arguments"""
+        digest = hashlib.sha256()
+        digest.update(file_bytes)
+        normalized = {k: v for k, v in partition_args.items() if k not in ('filename', 'file')}
+        digest.update(json.dumps(normalized, sort_keys=True, default=str).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[List]:
+        """Return the cached elements for a key, or None on a miss"""
+        from unstructured.staging.base import elements_from_json
+
+        path = self._path(key)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    payload = f.read()
+                os.utime(path)
+            except OSError:
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        return elements_from_json(text=payload)
+
+    def put(self, key: str, elements: List):
+        """Store elements under a key, evicting least recently used entries to stay in budget"""
+        from unstructured.staging.base import elements_to_json
+
+        payload = elements_to_json(elements, indent=None).encode('utf-8')
+        if len(payload) > self.max_bytes:
+            return
+
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = len(payload)
+            self._total_bytes += len(payload)
+            self._evict()
+
+    def _drop(self, key: str):
+        size = self._entries.pop(key, 0)
+        self._total_bytes -= size
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def clear(self):
+        """Remove every cached entry"""
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current footprint"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'size_bytes': self._total_bytes,
+            }
@@ -0,0 +1,101 @@
+import json
+import os
+from textwrap import indent
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+# Page sizes offered in the Results viewer, and the most serialized bytes sent per rerun
+VIEWER_PAGE_SIZES = [10, 25, 50, 100, 250]
+VIEWER_MAX_BYTES = int(os.getenv('VIEWER_MAX_BYTES', str(256 * 1024)))
+
+# Keys holding the element rows: 'content' for schema output, 'elements' for standard output
+ROW_KEYS = ('content', 'elements')
+
+
+def rows_key(json_data: Dict[str, Any]) -> Optional[str]:
+    for key in ROW_KEYS:
+        if isinstance(json_data.get(key), list):
+            return key
+    return None
+
+
+class ResultPager:
+    """Cursor over result rows that only serializes the visible page
+
+    The cursor is the position of the first row shown. A page holds up to
+    page_size rows but stops early once max_bytes have been produced, and
+    the next page starts right after the last row actually rendered, so the
+    byte cap never skips rows.
+    """
+
+    def __init__(self, total: int, page_size: int, cursor: int = 0, max_bytes: int = VIEWER_MAX_BYTES):
+        self.total = total
+        self.page_size = max(1, page_size)
+        self.max_bytes = max_bytes
+        self.cursor = min(max(0, cursor), max(0, total - 1))
+        self.rendered = 0
+
+    def page(self, rows: Sequence[Any]) -> Sequence[Any]:
+        """Rows in the current window, before the byte cap"""
+        return rows[self.cursor:self.cursor + self.page_size]
+
+    def fit(self, sizes: Iterable[int]) -> int:
+        """Number of leading rows whose sizes fit the byte cap; at least one"""
+        used = 0
+        count = 0
+        for size in sizes:
+            if count and used + size > self.max_bytes:
+                break
+            used += size
+            count += 1
+        self.rendered = count
+        return count
+
+    def fit_rows(self, rows: Sequence[Any], size_of: Callable[[Any], int]) -> Sequence[Any]:
+        """Current page cut down to the byte cap, sizing rows lazily with size_of"""
+        page = self.page(rows)
+        return page[:self.fit(size_of(row) for row in page)]
+
+    def serialize_page(self, rows: Sequence[Any], indent_width: int = 2) -> List[str]:
+        """Pretty JSON for each row of the current page, stopping at the byte cap"""
+        chunks: List[str] = []
+
+        def sizes():
+            for row in self.page(rows):
+                chunk = json.dumps(row, indent=indent_width, default=str)
+                chunks.append(chunk)
+                yield len(chunk.encode('utf-8'))
+
+        return chunks[:self.fit(sizes())]
+
+    def render_json(self, json_data: Dict[str, Any], indent_width: int = 2) -> str:
+        """json_data as pretty JSON with only the current page of its rows serialized"""
+        key = rows_key(json_data)
+        if key is None:
+            return json.dumps(json_data, indent=indent_width, default=str)
+
+        header = {name: value for name, value in json_data.items() if name != key}
+        chunks = self.serialize_page(json_data[key], indent_width)
+        pad = ' ' * indent_width
+        rows = ',\n'.join(indent(chunk, pad * 2) for chunk in chunks)
+        body = f'{pad}"{key}": [\n{rows}\n{pad}]'
+        if not header:
+            return '{\n' + body + '\n}'
+        # Reopen the serialized header to append the paged rows as its last key
+        return json.dumps(header, indent=indent_width, default=str)[:-2] + ',\n' + body + '\n}'
+
+    @property
+    def first_row(self) -> int:
+        return self.cursor + 1 if self.rendered else 0
+
+    @property
+    def last_row(self) -> int:
+        return self.cursor + self.rendered
+
+    @property
+    def next_cursor(self) -> Optional[int]:
+        end = self.cursor + self.rendered
+        return end if self.rendered and end < self.total else None
+
+    @property
+    def previous_cursor(self) -> Optional[int]:
+        return max(0, self.cursor - self.page_size) if self.cursor else None
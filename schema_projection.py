@@ -0,0 +1,86 @@
+from collections import Counter
+from itertools import repeat
+from typing import Any, Callable, Dict, List, Optional
+
+# Base keys every projected element starts with, before the schema fields
+BASE_COLUMNS = ('element_id', 'type', 'text', 'metadata')
+
+
+def _metadata_key(key: str) -> Callable:
+    return lambda columns: [metadata.get(key, None) for metadata in columns['metadata']]
+
+
+# field_type -> builder of a whole column from the shared base columns
+COLUMN_BUILDERS: Dict[str, Callable[[Dict[str, List[Any]]], List[Any]]] = {
+    'extracted_text': lambda columns: columns['text'],
+    'element_type': lambda columns: columns['type'],
+    'page_number': _metadata_key('page_number'),
+    'coordinates': _metadata_key('coordinates'),
+    'text_length': lambda columns: [len(text) for text in columns['text']],
+    'word_count': lambda columns: [len(text.split()) for text in columns['text']],
+    'parent_id': _metadata_key('parent_id'),
+    'filename': _metadata_key('filename'),
+}
+
+
+class SchemaProjection:
+    """Schema fields compiled once into a columnar projection over element dicts
+
+    Each distinct field type is computed as one column across all elements,
+    then rows are assembled with a single zip, instead of dispatching on the
+    field type for every element and field. Output matches the per-element
+    loop: fields are added after the base keys in schema order, a later field
+    overwrites an earlier key in place, and unknown field types are skipped.
+    """
+
+    def __init__(self, schema_fields: List[Dict[str, Any]]):
+        # output key -> ('base', column name) | ('field', field_type) | ('const', value)
+        sources: Dict[str, tuple] = {name: ('base', name) for name in BASE_COLUMNS}
+        for field in schema_fields:
+            name = field['field_name']
+            if not name:
+                continue
+            field_type = field['field_type']
+            if field_type == 'custom':
+                sources[name] = ('const', f"Custom field: {field['description']}")
+            elif field_type in COLUMN_BUILDERS:
+                sources[name] = ('field', field_type)
+
+        self.keys = list(sources)
+        self.sources = [sources[key] for key in self.keys]
+
+    @staticmethod
+    def base_columns(element_dicts: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+        return {
+            'element_id': [
+                element_dict['element_id'] if 'element_id' in element_dict else f"elem_{idx}"
+                for idx, element_dict in enumerate(element_dicts)
+            ],
+            'type': [element_dict.get("type", "") for element_dict in element_dicts],
+            'text': [element_dict.get("text", "") for element_dict in element_dicts],
+            'metadata': [element_dict.get("metadata", {}) for element_dict in element_dicts],
+        }
+
+    def project(self, element_dicts: List[Dict[str, Any]],
+                columns: Optional[Dict[str, List[Any]]] = None) -> List[Dict[str, Any]]:
+        """Project element dicts into schema rows, reusing precomputed base columns if given"""
+        columns = columns if columns is not None else self.base_columns(element_dicts)
+        field_columns: Dict[str, List[Any]] = {}
+        ordered = []
+        for kind, value in self.sources:
+            if kind == 'base':
+                ordered.append(columns[value])
+            elif kind == 'field':
+                if value not in field_columns:
+                    field_columns[value] = COLUMN_BUILDERS[value](columns)
+                ordered.append(field_columns[value])
+            else:
+                ordered.append(repeat(value, len(element_dicts)))
+
+        keys = self.keys
+        return [dict(zip(keys, row)) for row in zip(*ordered)]
+
+
+def element_type_counts(element_dicts: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Element type distribution in first-seen order"""
+    return dict(Counter(element_dict.get("type", "unknown") for element_dict in element_dicts))
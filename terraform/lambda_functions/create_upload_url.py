@@ -0,0 +1,49 @@
+import json
+import boto3
+import os
+import uuid
+
+s3_client = boto3.client('s3')
+BUCKET_NAME = os.environ['BUCKET_NAME']
+UPLOAD_URL_EXPIRES = int(os.environ.get('UPLOAD_URL_EXPIRES', '900'))
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_MB', '50')) * 1024 * 1024
+
+def handler(event, context):
+    try:
+        # Get user from JWT
+        claims = event['requestContext']['authorizer']['jwt']['claims']
+        user_id = claims['sub']
+        
+        # Only the base name is kept so the key always stays under the user's prefix
+        body = json.loads(event.get('body') or '{}')
+        filename = os.path.basename(str(body.get('filename', '')).replace('\\', '/')).strip()
+        if not filename:
+            return {'statusCode': 400, 'body': json.dumps({'error': 'filename is required'})}
+        
+        doc_id = str(uuid.uuid4())
+        s3_key = f"uploads/{user_id}/{doc_id}/{filename}"
+        
+        # The client POSTs the fields plus the raw file bytes as multipart form data, then calls
+        # /v1/process with the s3_key; unlike a presigned PUT, the policy caps the object size
+        upload = s3_client.generate_presigned_post(
+            Bucket=BUCKET_NAME,
+            Key=s3_key,
+            Conditions=[['content-length-range', 1, MAX_UPLOAD_BYTES]],
+            ExpiresIn=UPLOAD_URL_EXPIRES
+        )
+        
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({
+                'document_id': doc_id,
+                's3_key': s3_key,
+                'upload_url': upload['url'],
+                'upload_fields': upload['fields'],
+                'max_bytes': MAX_UPLOAD_BYTES,
+                'expires_in': UPLOAD_URL_EXPIRES
+            })
+        }
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
@@ -0,0 +1,203 @@
+import json
+import boto3
+import os
+import time
+import uuid
+from boto3.dynamodb.conditions import Key
+from datetime import datetime
+from decimal import Decimal
+
+dynamodb = boto3.resource('dynamodb')
+USERS_TABLE = os.environ['USERS_TABLE']
+USAGE_TABLE = os.environ['USAGE_TABLE']
+DOCUMENTS_TABLE = os.environ['DOCUMENTS_TABLE']
+MAX_RESERVED_CREDITS = int(os.environ.get('MAX_RESERVED_CREDITS', '10'))
+# Holds that are never committed or released (closed browser, interrupted run) are returned after this
+RESERVATION_TTL_SECONDS = int(os.environ.get('RESERVATION_TTL_SECONDS', '900'))
+
+users_table = dynamodb.Table(USERS_TABLE)
+documents_table = dynamodb.Table(DOCUMENTS_TABLE)
+
+# Reservations are document records in the 'reserved' state, so a committed
+# reservation looks the same as a document processed by process_document
+RESERVED = 'reserved'
+COMMITTED = 'completed'
+RELEASED = 'released'
+
+# Only held reservations carry hold_status, so this index lists open holds by expiry
+# and nothing else; settling a hold removes the attribute and drops it from the index
+RESERVED_HOLDS_INDEX = 'ReservedHoldsIndex'
+
+def respond(status_code, body):
+    return {
+        'statusCode': status_code,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps(body, default=lambda value: int(value) if isinstance(value, Decimal) else str(value))
+    }
+
+def get_credits(user_id):
+    item = users_table.get_item(Key={'user_id': user_id}).get('Item', {})
+    return int(item.get('credits', 0))
+
+def transact(items):
+    """Run DynamoDB writes atomically; returns False if a condition failed"""
+    client = dynamodb.meta.client
+    try:
+        client.transact_write_items(TransactItems=items)
+        return True
+    except client.exceptions.TransactionCanceledException:
+        return False
+
+def is_expired(reservation):
+    return int(reservation.get('expires_at', 0)) <= int(time.time())
+
+def settle(reservation, status):
+    """Move a held reservation to committed or released, once; returns False if it already moved"""
+    user_id = reservation['user_id']
+    reservation_id = reservation['document_id']
+    credits = int(reservation['credits_reserved'])
+    timestamp = datetime.utcnow().isoformat()
+    items = [{
+        'Update': {
+            'TableName': DOCUMENTS_TABLE,
+            'Key': {'document_id': reservation_id},
+            'UpdateExpression': 'SET #status = :status, updated_at = :time REMOVE hold_status',
+            'ConditionExpression': '#status = :reserved',
+            'ExpressionAttributeNames': {'#status': 'status'},
+            'ExpressionAttributeValues': {':status': status, ':reserved': RESERVED, ':time': timestamp}
+        }
+    }]
+    if status == COMMITTED:
+        # Same usage record process_document writes
+        items.append({
+            'Put': {
+                'TableName': USAGE_TABLE,
+                'Item': {
+                    'user_id': user_id,
+                    'timestamp': timestamp,
+                    'document_id': reservation_id,
+                    'credits_used': credits
+                }
+            }
+        })
+    else:
+        items.append({
+            'Update': {
+                'TableName': USERS_TABLE,
+                'Key': {'user_id': user_id},
+                'UpdateExpression': 'SET credits = credits + :n',
+                'ExpressionAttributeValues': {':n': credits}
+            }
+        })
+    return transact(items)
+
+def release_expired():
+    """Return the credits of every hold that outlived RESERVATION_TTL_SECONDS; run on a schedule"""
+    query = {
+        'IndexName': RESERVED_HOLDS_INDEX,
+        'KeyConditionExpression': Key('hold_status').eq(RESERVED) & Key('expires_at').lte(int(time.time()))
+    }
+    released = 0
+    while True:
+        response = documents_table.query(**query)
+        for reservation in response.get('Items', []):
+            released += settle(reservation, RELEASED)
+        if 'LastEvaluatedKey' not in response:
+            return released
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def reserve(user_id, body):
+    """Hold credits for a document before it is processed"""
+    credits = int(body.get('credits', 1))
+    if credits < 1 or credits > MAX_RESERVED_CREDITS:
+        return respond(400, {'error': f'credits must be between 1 and {MAX_RESERVED_CREDITS}'})
+
+    reservation_id = str(uuid.uuid4())
+    timestamp = datetime.utcnow().isoformat()
+    reserved = transact([
+        {
+            'Update': {
+                'TableName': USERS_TABLE,
+                'Key': {'user_id': user_id},
+                'UpdateExpression': 'SET credits = credits - :n',
+                'ConditionExpression': 'credits >= :n',
+                'ExpressionAttributeValues': {':n': credits}
+            }
+        },
+        {
+            'Put': {
+                'TableName': DOCUMENTS_TABLE,
+                'Item': {
+                    'document_id': reservation_id,
+                    'user_id': user_id,
+                    'filename': str(body.get('filename', '')),
+                    'status': RESERVED,
+                    'hold_status': RESERVED,
+                    'credits_reserved': credits,
+                    'created_at': timestamp,
+                    'expires_at': int(time.time()) + RESERVATION_TTL_SECONDS
+                },
+                'ConditionExpression': 'attribute_not_exists(document_id)'
+            }
+        }
+    ])
+    if not reserved:
+        return respond(429, {'error': 'Insufficient credits'})
+
+    return respond(200, {
+        'reservation_id': reservation_id,
+        'credits_reserved': credits,
+        'expires_in_seconds': RESERVATION_TTL_SECONDS,
+        'credits_remaining': get_credits(user_id)
+    })
+
+def finish(user_id, body, status):
+    """Commit or release a reservation; either only applies once"""
+    reservation_id = body.get('reservation_id')
+    if not reservation_id:
+        return respond(400, {'error': 'reservation_id is required'})
+
+    reservation = documents_table.get_item(Key={'document_id': reservation_id}).get('Item')
+    if reservation is None or reservation.get('user_id') != user_id:
+        return respond(404, {'error': 'Reservation not found'})
+    if reservation['status'] != RESERVED:
+        return respond(409, {'error': f"Reservation is already {reservation['status']}"})
+    if status == COMMITTED and is_expired(reservation):
+        # Past its expiry a hold counts as released, so it can no longer be spent
+        settle(reservation, RELEASED)
+        return respond(410, {'error': 'Reservation expired'})
+
+    if not settle(reservation, status):
+        return respond(409, {'error': 'Reservation was already committed or released'})
+
+    return respond(200, {
+        'reservation_id': reservation_id,
+        'status': status,
+        'credits_remaining': get_credits(user_id)
+    })
+
+def handler(event, context):
+    if event.get('source') == 'aws.events':
+        # Scheduled sweep of expired holds
+        released = release_expired()
+        print(f"Released {released} expired reservations")
+        return {'released': released}
+
+    try:
+        # Get user from JWT
+        claims = event['requestContext']['authorizer']['jwt']['claims']
+        user_id = claims['sub']
+
+        body = json.loads(event.get('body') or '{}')
+        action = event['rawPath'].rstrip('/').rsplit('/', 1)[-1]
+
+        if action == 'reserve':
+            return reserve(user_id, body)
+        if action == 'commit':
+            return finish(user_id, body, COMMITTED)
+        if action == 'release':
+            return finish(user_id, body, RELEASED)
+        return respond(404, {'error': 'Unknown credits action'})
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
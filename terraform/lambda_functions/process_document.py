@@ -1,57 +1,347 @@
 import json
-import boto3
 import os
 import base64
+import csv
 import uuid
+import zipfile
 from datetime import datetime
-import PyPDF2
+import hashlib
 import io
-
-dynamodb = boto3.resource('dynamodb')
-s3_client = boto3.client('s3')
-bedrock = boto3.client('bedrock-runtime', region_name='us-east-1')
+import posixpath
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from html.parser import HTMLParser
+from xml.etree import ElementTree
 
 USERS_TABLE = os.environ['USERS_TABLE']
 USAGE_TABLE = os.environ['USAGE_TABLE']
 DOCUMENTS_TABLE = os.environ['DOCUMENTS_TABLE']
 BUCKET_NAME = os.environ['BUCKET_NAME']
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_MB', '50')) * 1024 * 1024
 
-users_table = dynamodb.Table(USERS_TABLE)
-usage_table = dynamodb.Table(USAGE_TABLE)
-documents_table = dynamodb.Table(DOCUMENTS_TABLE)
+# boto3 and PyPDF2 are imported on first use to keep them out of the cold start;
+# each client is created once and reused across warm invocations
 
-def extract_text_from_pdf(file_content):
-    """Extract text from PDF"""
+@lru_cache(maxsize=None)
+def get_dynamodb():
+    import boto3
+    return boto3.resource('dynamodb')
+
+@lru_cache(maxsize=None)
+def get_table(name):
+    return get_dynamodb().Table(name)
+
+@lru_cache(maxsize=None)
+def get_s3_client():
+    import boto3
+    return boto3.client('s3')
+
+@lru_cache(maxsize=None)
+def get_bedrock():
+    import boto3
+    return boto3.client('bedrock-runtime', region_name='us-east-1')
+
+# The role has s3:ListBucket, so a missing key is NoSuchKey/404 and AccessDenied stays a real error
+MISSING_OBJECT_ERROR_CODES = {'NoSuchKey', 'NotFound', '404'}
+
+def is_missing_object(error):
+    """Whether an S3 ClientError means the object isn't there"""
+    return error.response.get('Error', {}).get('Code') in MISSING_OBJECT_ERROR_CODES
+
+def discard_upload(s3_key):
+    """Delete a presigned upload that failed validation, so rejected files aren't kept"""
     try:
-        pdf_file = io.BytesIO(file_content)
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        
-        all_text = []
-        for page in pdf_reader.pages:
-            text = page.extract_text()
-            all_text.append(text.strip())
-        
-        return '\n\n'.join(all_text)
+        get_s3_client().delete_object(Bucket=BUCKET_NAME, Key=s3_key)
     except Exception as e:
-        return f'Error extracting PDF: {str(e)}'
+        print(f"Could not delete rejected upload {s3_key}: {str(e)}")
+
+# Reused across warm invocations for AWS calls that don't depend on each other
+io_pool = ThreadPoolExecutor(max_workers=4)
+
+def wait_all(futures):
+    """Wait for every future, then raise the first error if any call failed; None entries are skipped"""
+    errors = [future.exception() for future in futures if future is not None]
+    for error in errors:
+        if error is not None:
+            raise error
+
+def iter_pdf_page_texts(file_content):
+    """Yield the text of each PDF page as soon as it is extracted"""
+    import PyPDF2
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
+    for page in pdf_reader.pages:
+        yield page.extract_text().strip()
+
+class UnsupportedDocumentError(Exception):
+    """Raised for uploads that can't be turned into text, before any model call or credit use"""
+
+def extract_text_from_pdf(file_content):
+    """Extract text from PDF
+
+    The pages are joined into one string on purpose: the LLM cache key hashes
+    the whole text before any model call, and the chunker, text_length and
+    raw_text all read it. Streaming pages further would not start the model
+    sooner or lower peak memory here, which MAX_UPLOAD_MB bounds anyway.
+    """
+    return '\n\n'.join(iter_pdf_page_texts(file_content))
+
+def decode_text(file_content):
+    """Decode text bytes, tolerating a UTF-8 BOM and falling back to Latin-1"""
+    try:
+        return file_content.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return file_content.decode('latin-1')
 
 def extract_text_from_txt(file_content):
-    """Extract text from TXT file"""
+    """Extract text from TXT or Markdown file"""
+    return decode_text(file_content)
+
+def extract_text_from_csv(file_content):
+    """Extract CSV rows as pipe-separated lines"""
+    reader = csv.reader(io.StringIO(decode_text(file_content)))
+    return '\n'.join(' | '.join(cell.strip() for cell in row) for row in reader if any(row))
+
+class HTMLTextParser(HTMLParser):
+    """Collect visible text from HTML, breaking lines at block elements"""
+
+    SKIPPED_TAGS = {'script', 'style', 'noscript', 'template', 'head'}
+    BLOCK_TAGS = {
+        'p', 'div', 'br', 'li', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+        'section', 'article', 'header', 'footer', 'table', 'ul', 'ol', 'pre', 'blockquote'
+    }
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self.skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS:
+            self.skip_depth = max(self.skip_depth - 1, 0)
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.parts.append(data)
+
+    def text(self):
+        lines = (' '.join(line.split()) for line in ''.join(self.parts).split('\n'))
+        return '\n'.join(line for line in lines if line)
+
+def extract_text_from_html(file_content):
+    """Extract visible text from HTML"""
+    parser = HTMLTextParser()
+    parser.feed(decode_text(file_content))
+    parser.close()
+    return parser.text()
+
+# Office Open XML namespaces
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+A_NS = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+S_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+P_NS = '{http://schemas.openxmlformats.org/presentationml/2006/main}'
+R_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+def _part_targets(archive, part):
+    """Archive paths of a part's relationships, by relationship id"""
+    folder, name = posixpath.split(part)
+    rels = ElementTree.fromstring(archive.read(f'{folder}/_rels/{name}.rels'))
+    targets = {}
+    for rel in rels.iter(f'{PKG_REL_NS}Relationship'):
+        target = rel.get('Target', '')
+        targets[rel.get('Id')] = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join(folder, target))
+    return targets
+
+# Containers whose paragraphs belong to the document flow; text boxes (w:txbxContent) are not among them
+DOCX_BLOCK_CONTAINERS = {f'{W_NS}tbl', f'{W_NS}tr', f'{W_NS}tc', f'{W_NS}sdt', f'{W_NS}sdtContent'}
+
+def _docx_paragraphs(container):
+    """Body-level and table cell paragraphs in document order"""
+    for child in container:
+        if child.tag == f'{W_NS}p':
+            yield child
+        elif child.tag in DOCX_BLOCK_CONTAINERS:
+            yield from _docx_paragraphs(child)
+
+def _docx_runs(node):
+    """Text of a paragraph's runs, without text boxes anchored in it"""
+    for child in node:
+        if child.tag == f'{W_NS}t':
+            yield child.text or ''
+        elif child.tag == f'{W_NS}tab':
+            yield '\t'
+        elif child.tag in (f'{W_NS}br', f'{W_NS}cr'):
+            yield '\n'
+        elif child.tag != f'{W_NS}txbxContent':
+            yield from _docx_runs(child)
+
+def extract_text_from_docx(file_content):
+    """Extract paragraph text from a Word document"""
+    with zipfile.ZipFile(io.BytesIO(file_content)) as archive:
+        root = ElementTree.fromstring(archive.read('word/document.xml'))
+    paragraphs = []
+    for paragraph in _docx_paragraphs(root.find(f'{W_NS}body')):
+        text = ''.join(_docx_runs(paragraph)).strip()
+        if text:
+            paragraphs.append(text)
+    return '\n\n'.join(paragraphs)
+
+def extract_text_from_pptx(file_content):
+    """Extract slide text from a PowerPoint deck, one block per slide"""
+    slides = []
+    with zipfile.ZipFile(io.BytesIO(file_content)) as archive:
+        # Slide order is the presentation's slide list, not the part file names
+        presentation = ElementTree.fromstring(archive.read('ppt/presentation.xml'))
+        targets = _part_targets(archive, 'ppt/presentation.xml')
+        slide_ids = presentation.iter(f'{P_NS}sldId')
+        for number, slide_id in enumerate(slide_ids, start=1):
+            root = ElementTree.fromstring(archive.read(targets[slide_id.get(f'{R_NS}id')]))
+            lines = []
+            for paragraph in root.iter(f'{A_NS}p'):
+                text = ''.join(node.text or '' for node in paragraph.iter(f'{A_NS}t')).strip()
+                if text:
+                    lines.append(text)
+            if lines:
+                slides.append(f"Slide {number}\n" + '\n'.join(lines))
+    return '\n\n'.join(slides)
+
+def extract_text_from_xlsx(file_content):
+    """Extract cell values from an Excel workbook, one block per sheet"""
+    with zipfile.ZipFile(io.BytesIO(file_content)) as archive:
+        names = set(archive.namelist())
+        shared_strings = []
+        if 'xl/sharedStrings.xml' in names:
+            root = ElementTree.fromstring(archive.read('xl/sharedStrings.xml'))
+            shared_strings = [
+                ''.join(node.text or '' for node in item.iter(f'{S_NS}t'))
+                for item in root.iter(f'{S_NS}si')
+            ]
+
+        # Sheet names and their parts come from the workbook and its relationships
+        workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+        targets = _part_targets(archive, 'xl/workbook.xml')
+
+        sheets = []
+        for sheet in workbook.iter(f'{S_NS}sheet'):
+            path = targets.get(sheet.get(f'{R_NS}id'), '')
+            if path not in names:
+                continue
+            rows = []
+            for row in ElementTree.fromstring(archive.read(path)).iter(f'{S_NS}row'):
+                values = []
+                for cell in row.iter(f'{S_NS}c'):
+                    cell_type = cell.get('t')
+                    if cell_type == 'inlineStr':
+                        value = ''.join(node.text or '' for node in cell.iter(f'{S_NS}t'))
+                    else:
+                        node = cell.find(f'{S_NS}v')
+                        value = node.text if node is not None and node.text else ''
+                        if cell_type == 's' and value:
+                            value = shared_strings[int(value)]
+                    values.append(value.strip())
+                if any(values):
+                    rows.append(' | '.join(values))
+            if rows:
+                sheets.append(f"Sheet: {sheet.get('name')}\n" + '\n'.join(rows))
+    return '\n\n'.join(sheets)
+
+TEXT_EXTRACTORS = {
+    'pdf': extract_text_from_pdf,
+    'txt': extract_text_from_txt,
+    'text': extract_text_from_txt,
+    'md': extract_text_from_txt,
+    'markdown': extract_text_from_txt,
+    'csv': extract_text_from_csv,
+    'html': extract_text_from_html,
+    'htm': extract_text_from_html,
+    'docx': extract_text_from_docx,
+    'pptx': extract_text_from_pptx,
+    'xlsx': extract_text_from_xlsx,
+}
+
+def get_file_extension(filename):
+    return filename.lower().rsplit('.', 1)[-1] if '.' in filename else ''
+
+def extract_text(file_content, file_ext):
+    """Extract text with the parser for the file type, raising UnsupportedDocumentError on failure"""
+    extractor = TEXT_EXTRACTORS.get(file_ext)
+    if extractor is None:
+        raise UnsupportedDocumentError(f"Unsupported file type: .{file_ext}" if file_ext else "File has no extension")
     try:
-        return file_content.decode('utf-8')
-    except:
-        return 'Error reading text file'
+        text = extractor(file_content)
+    except Exception as e:
+        raise UnsupportedDocumentError(f"Could not read .{file_ext} file: {str(e)}")
+    if not text.strip():
+        raise UnsupportedDocumentError(f"No text found in .{file_ext} file")
+    return text
 
-def extract_structured_data_with_llm(text, filename):
-    """Use AWS Bedrock Claude to extract meaningful structured data"""
-    
-    # Determine document type from content
-    prompt = f"""Analyze this document and extract structured, meaningful data.
+# Long documents are split into chunks of roughly this many tokens (~4 characters each),
+# extracted concurrently and merged, so the whole text is covered
+LLM_CHUNK_TOKENS = int(os.environ.get('LLM_CHUNK_TOKENS', '1000'))
+LLM_MAX_CHUNKS = int(os.environ.get('LLM_MAX_CHUNKS', '16'))
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '4'))
+CHARS_PER_TOKEN = 4
+LLM_MODEL_ID = 'anthropic.claude-3-haiku-20240307-v1:0'
 
-Document filename: {filename}
+def split_text_into_chunks(text, max_tokens=LLM_CHUNK_TOKENS, max_chunks=LLM_MAX_CHUNKS):
+    """Split text into paragraph-aligned chunks of at most max_tokens each
+
+    If the text would need more than max_chunks chunks, the budget grows so the
+    number of model calls stays bounded while the whole text is still covered.
+    """
+    max_tokens = max(max_tokens, -(-len(text) // (CHARS_PER_TOKEN * max_chunks)))
+    max_chars = max_tokens * CHARS_PER_TOKEN
+
+    # Paragraphs first, then lines, then a hard cut for anything still too long
+    pieces = []
+    for paragraph in re.split(r'\n\s*\n', text):
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for line in paragraph.split('\n'):
+            pieces.extend(line[start:start + max_chars] for start in range(0, len(line), max_chars))
 
+    chunks = []
+    current = ''
+    for piece in pieces:
+        if not piece.strip():
+            continue
+        if current and len(current) + 2 + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+def build_extraction_prompt(chunk, filename, part=1, parts=1):
+    """Extraction prompt for one chunk of a document"""
+    section = ''
+    if parts > 1:
+        section = f"""
+This is part {part} of {parts} of the document. Extract only what appears in this part;
+the parts are merged afterwards, so omit fields this part says nothing about.
+"""
+    return f"""Analyze this document and extract structured, meaningful data.
+
+Document filename: {filename}
+{section}
 Document content:
-{text[:4000]}
+{chunk}
 
 Based on the content, intelligently extract relevant structured information. 
 
@@ -85,37 +375,315 @@ If it's OTHER, extract:
 
 Return ONLY valid JSON with the extracted structured data. Be intelligent about categorization."""
 
-    try:
-        response = bedrock.invoke_model(
-            modelId='anthropic.claude-3-haiku-20240307-v1:0',
-            body=json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 2000,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            })
+def invoke_bedrock(prompt):
+    """Send a prompt to Claude on Bedrock and return the response text"""
+    response = get_bedrock().invoke_model(
+        modelId=LLM_MODEL_ID,
+        body=json.dumps({
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": 2000,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+        })
+    )
+    response_body = json.loads(response['body'].read())
+    return response_body['content'][0]['text']
+
+def parse_llm_json(llm_output):
+    """Pull the JSON object out of a model response, or None if there isn't one"""
+    json_start = llm_output.find('{')
+    json_end = llm_output.rfind('}') + 1
+    if json_start != -1 and json_end > json_start:
+        return json.loads(llm_output[json_start:json_end])
+    return None
+
+def _is_empty(value):
+    return value is None or value == '' or value == [] or value == {}
+
+def merge_extractions(partials):
+    """Deep-merge per-chunk results in chunk order
+
+    Objects merge key by key, lists are concatenated without duplicates, and for
+    scalars the first non-empty value wins, so the same inputs always give the
+    same output.
+    """
+    merged = {}
+    for partial in partials:
+        merged = _merge_values(merged, partial)
+    return merged
+
+def _merge_values(left, right):
+    if _is_empty(left):
+        return right
+    if _is_empty(right):
+        return left
+    if isinstance(left, dict) and isinstance(right, dict):
+        merged = dict(left)
+        for key, value in right.items():
+            merged[key] = _merge_values(merged[key], value) if key in merged else value
+        return merged
+    if isinstance(left, list) or isinstance(right, list):
+        items = (left if isinstance(left, list) else [left]) + (right if isinstance(right, list) else [right])
+        seen = set()
+        merged = []
+        for item in items:
+            marker = json.dumps(item, sort_keys=True, default=str)
+            if marker not in seen:
+                seen.add(marker)
+                merged.append(item)
+        return merged
+    return left
+
+def extract_structured_data_with_llm(text, filename, invoke_model=None):
+    """Use AWS Bedrock Claude to extract meaningful structured data
+
+    The text is mapped chunk by chunk with up to LLM_MAX_CONCURRENCY calls in
+    flight and the partial results are merged. Chunks that fail (e.g. throttled)
+    are retried once; if any still fail, the merged result of the others is
+    returned with an 'error' and the failed part numbers, so it is never cached
+    as a complete extraction. invoke_model takes a prompt and returns the
+    model's text, and defaults to Bedrock; pass a fake to test locally.
+    """
+    invoke_model = invoke_model or invoke_bedrock
+    chunks = split_text_into_chunks(text) or ['']
+
+    def extract_chunk(numbered_chunk):
+        part, chunk = numbered_chunk
+        try:
+            return parse_llm_json(invoke_model(build_extraction_prompt(chunk, filename, part, len(chunks)))), None
+        except Exception as e:
+            print(f"LLM extraction error on part {part}/{len(chunks)}: {str(e)}")
+            return None, str(e)
+
+    if len(chunks) == 1:
+        results = [extract_chunk((1, chunks[0]))]
+    else:
+        with ThreadPoolExecutor(max_workers=min(LLM_MAX_CONCURRENCY, len(chunks))) as pool:
+            results = list(pool.map(extract_chunk, enumerate(chunks, start=1)))
+
+    # Retry failed chunks once, one at a time to ease off a throttled model
+    for idx, (_, error) in enumerate(results):
+        if error:
+            results[idx] = extract_chunk((idx + 1, chunks[idx]))
+
+    partials = [data for data, _ in results if isinstance(data, dict)]
+    errors = [error for _, error in results if error]
+    if partials and errors:
+        merged = merge_extractions(partials)
+        merged["error"] = errors[0]
+        merged["failed_parts"] = [part for part, (_, error) in enumerate(results, start=1) if error]
+        return merged
+    if partials:
+        return merge_extractions(partials)
+    if errors:
+        return {"error": errors[0], "raw_text": text[:1000]}
+    return {"raw_text": text[:1000], "note": "Could not extract structured data"}
+
+# Extraction results are cached by content hash so resubmitting a document costs no model call
+LLM_CACHE_BACKEND = os.environ.get('LLM_CACHE_BACKEND', 'memory')  # none, memory, disk, s3, dynamodb
+LLM_CACHE_TTL_SECONDS = int(os.environ.get('LLM_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', '256'))
+LLM_CACHE_MAX_ENTRY_BYTES = int(os.environ.get('LLM_CACHE_MAX_ENTRY_KB', '350')) * 1024
+LLM_CACHE_DIR = os.environ.get('LLM_CACHE_DIR', '/tmp/llm-cache')
+LLM_CACHE_MAX_BYTES = int(os.environ.get('LLM_CACHE_MAX_MB', '256')) * 1024 * 1024
+LLM_CACHE_PREFIX = os.environ.get('LLM_CACHE_PREFIX', 'llm-cache/')
+LLM_CACHE_TABLE = os.environ.get('LLM_CACHE_TABLE', '')
+# Bump when the prompt or merge logic changes so older results are not reused
+LLM_CACHE_VERSION = '1'
+
+def llm_cache_key(text, filename):
+    """Hash of everything that determines the extraction result"""
+    key_parts = [LLM_CACHE_VERSION, LLM_MODEL_ID, get_file_extension(filename), LLM_CHUNK_TOKENS, LLM_MAX_CHUNKS, text]
+    return hashlib.sha256(json.dumps(key_parts).encode('utf-8')).hexdigest()
+
+class CacheStore(ABC):
+    """Storage for serialized cache entries; get returns None for missing or expired keys"""
+
+    @abstractmethod
+    def get(self, key):
+        raise NotImplementedError
+
+    @abstractmethod
+    def put(self, key, value, expires_at):
+        raise NotImplementedError
+
+class MemoryCacheStore(CacheStore):
+    """LRU store that lives as long as the warm Lambda container"""
+
+    def __init__(self, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+class DiskCacheStore(CacheStore):
+    """Store under a local directory, evicting the least recently written files past max_bytes"""
+
+    def __init__(self, cache_dir=LLM_CACHE_DIR, max_bytes=LLM_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry['expires_at'] <= time.time():
+            os.unlink(self._path(key))
+            return None
+        return entry['value']
+
+    def put(self, key, value, expires_at):
+        tmp_path = f"{self._path(key)}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'expires_at': expires_at, 'value': value}, f)
+        os.replace(tmp_path, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        entries = sorted(
+            (entry.stat().st_mtime, entry.stat().st_size, entry.path)
+            for entry in os.scandir(self.cache_dir) if entry.name.endswith('.json')
         )
-        
-        response_body = json.loads(response['body'].read())
-        llm_output = response_body['content'][0]['text']
-        
-        # Extract JSON from response
-        json_start = llm_output.find('{')
-        json_end = llm_output.rfind('}') + 1
-        
-        if json_start != -1 and json_end > json_start:
-            structured_data = json.loads(llm_output[json_start:json_end])
-            return structured_data
-        else:
-            return {"raw_text": text[:1000], "note": "Could not extract structured data"}
-            
-    except Exception as e:
-        print(f"LLM extraction error: {str(e)}")
-        return {"error": str(e), "raw_text": text[:1000]}
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            os.unlink(path)
+            total -= size
+
+class S3CacheStore(CacheStore):
+    """Store as objects under a prefix in the documents bucket; a lifecycle rule on the prefix deletes expired ones"""
+
+    def __init__(self, bucket=BUCKET_NAME, prefix=LLM_CACHE_PREFIX):
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def get(self, key):
+        s3_client = get_s3_client()
+        try:
+            response = s3_client.get_object(Bucket=self.bucket, Key=f"{self.prefix}{key}.json")
+        except s3_client.exceptions.ClientError as e:
+            if is_missing_object(e):
+                return None
+            raise
+        entry = json.loads(response['Body'].read())
+        if entry['expires_at'] <= time.time():
+            return None
+        return entry['value']
+
+    def put(self, key, value, expires_at):
+        get_s3_client().put_object(
+            Bucket=self.bucket,
+            Key=f"{self.prefix}{key}.json",
+            Body=json.dumps({'expires_at': expires_at, 'value': value}),
+            ContentType='application/json'
+        )
+
+class DynamoDBCacheStore(CacheStore):
+    """Store as items keyed by cache_key; enable DynamoDB TTL on expires_at to clean up"""
+
+    def __init__(self, table_name=LLM_CACHE_TABLE):
+        self.table_name = table_name
+
+    def get(self, key):
+        item = get_table(self.table_name).get_item(Key={'cache_key': key}).get('Item')
+        if item is None or item['expires_at'] <= time.time():
+            return None
+        return item['value']
+
+    def put(self, key, value, expires_at):
+        get_table(self.table_name).put_item(Item={
+            'cache_key': key,
+            'value': value,
+            'expires_at': int(expires_at)
+        })
+
+class LLMResultCache:
+    """TTL cache of structured extraction results over a pluggable store
+
+    Store errors are logged and treated as misses, so a cache outage only costs
+    the model call it would have saved.
+    """
+
+    def __init__(self, store, ttl_seconds=LLM_CACHE_TTL_SECONDS, max_entry_bytes=LLM_CACHE_MAX_ENTRY_BYTES):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.max_entry_bytes = max_entry_bytes
+
+    def get(self, key):
+        try:
+            value = self.store.get(key)
+        except Exception as e:
+            print(f"LLM cache read error: {str(e)}")
+            return None
+        return json.loads(value) if value is not None else None
+
+    def put(self, key, data):
+        value = json.dumps(data)
+        if len(value.encode('utf-8')) > self.max_entry_bytes:
+            return
+        try:
+            self.store.put(key, value, time.time() + self.ttl_seconds)
+        except Exception as e:
+            print(f"LLM cache write error: {str(e)}")
+
+def build_llm_cache(backend=LLM_CACHE_BACKEND):
+    """Create the extraction cache for the configured backend, or None when disabled"""
+    stores = {
+        'memory': MemoryCacheStore,
+        'disk': DiskCacheStore,
+        's3': S3CacheStore,
+        'dynamodb': DynamoDBCacheStore,
+    }
+    if backend not in stores:
+        return None
+    return LLMResultCache(stores[backend]())
+
+llm_cache = build_llm_cache()
+
+def extract_structured_data_cached(text, filename, cache=None, invoke_model=None):
+    """Extract structured data through the result cache; returns (data, cache_hit)"""
+    cache = cache if cache is not None else llm_cache
+    if cache is None:
+        return extract_structured_data_with_llm(text, filename, invoke_model), False
+
+    key = llm_cache_key(text, filename)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached, True
+
+    structured_data = extract_structured_data_with_llm(text, filename, invoke_model)
+    # Failed and partial extractions carry an error or the raw text; only complete results are reused
+    if 'error' not in structured_data and 'raw_text' not in structured_data:
+        cache.put(key, structured_data)
+    return structured_data, False
 
 def handler(event, context):
     try:
@@ -123,7 +691,32 @@ def handler(event, context):
         claims = event['requestContext']['authorizer']['jwt']['claims']
         user_id = claims['sub']
         
+        # Parse request and reject unsupported types before touching credits
+        body = json.loads(event.get('body', '{}'))
+        s3_key = body.get('s3_key')
+        inline_upload = not s3_key
+        if s3_key:
+            # Binary upload mode: the file was PUT to S3 through a /v1/uploads presigned URL
+            key_parts = s3_key.split('/')
+            if len(key_parts) != 4 or key_parts[:2] != ['uploads', user_id]:
+                return {'statusCode': 403, 'body': json.dumps({'error': 'Object key does not belong to this user'})}
+            doc_id, filename = key_parts[2], key_parts[3]
+            file_content = None
+        else:
+            file_content = base64.b64decode(body['file'])
+            filename = body.get('filename', 'document.pdf')
+        file_ext = get_file_extension(filename)
+        
+        if file_ext not in TEXT_EXTRACTORS:
+            if s3_key:
+                discard_upload(s3_key)
+            return {'statusCode': 415, 'body': json.dumps({
+                'error': f'Unsupported file type: .{file_ext}',
+                'supported_types': sorted(TEXT_EXTRACTORS)
+            })}
+        
         # Check credits
+        users_table = get_table(USERS_TABLE)
         user_response = users_table.get_item(Key={'user_id': user_id})
         if 'Item' not in user_response:
             return {'statusCode': 404, 'body': json.dumps({'error': 'User not found'})}
@@ -134,31 +727,42 @@ def handler(event, context):
         if credits <= 0:
             return {'statusCode': 429, 'body': json.dumps({'error': 'Insufficient credits'})}
         
-        # Parse request
-        body = json.loads(event.get('body', '{}'))
-        file_content = base64.b64decode(body['file'])
-        filename = body.get('filename', 'document.pdf')
-        
-        # Generate IDs
-        doc_id = str(uuid.uuid4())
         timestamp = datetime.utcnow().isoformat()
         
-        # Save to S3
-        s3_key = f"uploads/{user_id}/{doc_id}/{filename}"
-        s3_client.put_object(Bucket=BUCKET_NAME, Key=s3_key, Body=file_content)
+        if s3_key:
+            # Already in S3, so there is nothing to upload
+            s3_client = get_s3_client()
+            try:
+                s3_object = s3_client.get_object(Bucket=BUCKET_NAME, Key=s3_key)
+            except s3_client.exceptions.ClientError as e:
+                if is_missing_object(e):
+                    return {'statusCode': 404, 'body': json.dumps({'error': 'Uploaded object not found'})}
+                raise
+            if s3_object['ContentLength'] > MAX_UPLOAD_BYTES:
+                s3_object['Body'].close()
+                discard_upload(s3_key)
+                return {'statusCode': 413, 'body': json.dumps({'error': 'File is too large'})}
+            file_content = s3_object['Body'].read()
+        else:
+            doc_id = str(uuid.uuid4())
+            s3_key = f"uploads/{user_id}/{doc_id}/{filename}"
         
-        # Extract text based on file type
-        file_ext = filename.lower().split('.')[-1]
+        # Extract text based on file type; unreadable files fail here, before the model call
+        try:
+            raw_text = extract_text(file_content, file_ext)
+        except UnsupportedDocumentError as e:
+            if not inline_upload:
+                discard_upload(s3_key)
+            return {'statusCode': 422, 'body': json.dumps({'error': str(e)})}
         
-        if file_ext == 'pdf':
-            raw_text = extract_text_from_pdf(file_content)
-        elif file_ext in ['txt', 'text']:
-            raw_text = extract_text_from_txt(file_content)
-        else:
-            raw_text = 'Unsupported file type'
+        # Save inline uploads to S3 in the background while the model runs; only readable
+        # files are stored, so a rejected file never leaves an orphan object behind
+        upload = None
+        if inline_upload:
+            upload = io_pool.submit(get_s3_client().put_object, Bucket=BUCKET_NAME, Key=s3_key, Body=file_content)
         
         # Use LLM to extract meaningful structured data
-        structured_data = extract_structured_data_with_llm(raw_text, filename)
+        structured_data, cache_hit = extract_structured_data_cached(raw_text, filename)
         
         # Build final output
         result = {
@@ -172,34 +776,38 @@ def handler(event, context):
                 'file_size_bytes': len(file_content),
                 's3_location': s3_key,
                 'text_length': len(raw_text),
-                'model_used': 'claude-3-haiku'
+                'model_used': 'claude-3-haiku',
+                'llm_cache_hit': cache_hit
             }
         }
         
-        # Save document metadata
-        documents_table.put_item(Item={
-            'document_id': doc_id,
-            'user_id': user_id,
-            'filename': filename,
-            's3_key': s3_key,
-            'status': 'completed',
-            'created_at': timestamp
-        })
+        # The document must be stored before anything points at it or a credit is charged
+        if upload is not None:
+            upload.result()
         
-        # Track usage
-        usage_table.put_item(Item={
-            'user_id': user_id,
-            'timestamp': timestamp,
-            'document_id': doc_id,
-            'credits_used': 1
-        })
-        
-        # Deduct credits
-        users_table.update_item(
-            Key={'user_id': user_id},
-            UpdateExpression='SET credits = credits - :dec',
-            ExpressionAttributeValues={':dec': 1}
-        )
+        # Metadata, usage and credit writes are independent, so run them together
+        wait_all([
+            io_pool.submit(get_table(DOCUMENTS_TABLE).put_item, Item={
+                'document_id': doc_id,
+                'user_id': user_id,
+                'filename': filename,
+                's3_key': s3_key,
+                'status': 'completed',
+                'created_at': timestamp
+            }),
+            io_pool.submit(get_table(USAGE_TABLE).put_item, Item={
+                'user_id': user_id,
+                'timestamp': timestamp,
+                'document_id': doc_id,
+                'credits_used': 1
+            }),
+            io_pool.submit(
+                users_table.update_item,
+                Key={'user_id': user_id},
+                UpdateExpression='SET credits = credits - :dec',
+                ExpressionAttributeValues={':dec': 1}
+            )
+        ])
         
         return {
             'statusCode': 200,
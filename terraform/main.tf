@@ -55,6 +55,10 @@ module "api_gateway" {
   user_pool_client_id       = module.cognito.user_pool_client_id
   process_document_invoke_arn = module.lambda.process_document_invoke_arn
   process_document_function_name = module.lambda.process_document_function_name
+  create_upload_url_invoke_arn = module.lambda.create_upload_url_invoke_arn
+  create_upload_url_function_name = module.lambda.create_upload_url_function_name
+  manage_credits_invoke_arn = module.lambda.manage_credits_invoke_arn
+  manage_credits_function_name = module.lambda.manage_credits_function_name
   register_user_invoke_arn  = module.lambda.register_user_invoke_arn
   register_user_function_name = module.lambda.register_user_function_name
   get_credits_invoke_arn    = module.lambda.get_credits_invoke_arn
@@ -49,6 +49,31 @@ resource "aws_lambda_permission" "process_document" {
   source_arn    = "${aws_apigatewayv2_api.main.execution_arn}/*/*"
 }
 
+# Create Upload URL Integration
+resource "aws_apigatewayv2_integration" "create_upload_url" {
+  api_id           = aws_apigatewayv2_api.main.id
+  integration_type = "AWS_PROXY"
+  integration_uri  = var.create_upload_url_invoke_arn
+  integration_method = "POST"
+  payload_format_version = "2.0"
+}
+
+resource "aws_apigatewayv2_route" "create_upload_url" {
+  api_id    = aws_apigatewayv2_api.main.id
+  route_key = "POST /v1/uploads"
+  target    = "integrations/${aws_apigatewayv2_integration.create_upload_url.id}"
+  authorization_type = "JWT"
+  authorizer_id = aws_apigatewayv2_authorizer.cognito.id
+}
+
+resource "aws_lambda_permission" "create_upload_url" {
+  statement_id  = "AllowAPIGatewayInvoke"
+  action        = "lambda:InvokeFunction"
+  function_name = var.create_upload_url_function_name
+  principal     = "apigateway.amazonaws.com"
+  source_arn    = "${aws_apigatewayv2_api.main.execution_arn}/*/*"
+}
+
 # Register User Integration
 resource "aws_apigatewayv2_integration" "register_user" {
   api_id           = aws_apigatewayv2_api.main.id
@@ -97,6 +122,32 @@ resource "aws_lambda_permission" "get_credits" {
   source_arn    = "${aws_apigatewayv2_api.main.execution_arn}/*/*"
 }
 
+# Manage Credits Integration
+resource "aws_apigatewayv2_integration" "manage_credits" {
+  api_id           = aws_apigatewayv2_api.main.id
+  integration_type = "AWS_PROXY"
+  integration_uri  = var.manage_credits_invoke_arn
+  integration_method = "POST"
+  payload_format_version = "2.0"
+}
+
+resource "aws_apigatewayv2_route" "manage_credits" {
+  for_each  = toset(["reserve", "commit", "release"])
+  api_id    = aws_apigatewayv2_api.main.id
+  route_key = "POST /v1/credits/${each.key}"
+  target    = "integrations/${aws_apigatewayv2_integration.manage_credits.id}"
+  authorization_type = "JWT"
+  authorizer_id = aws_apigatewayv2_authorizer.cognito.id
+}
+
+resource "aws_lambda_permission" "manage_credits" {
+  statement_id  = "AllowAPIGatewayInvoke"
+  action        = "lambda:InvokeFunction"
+  function_name = var.manage_credits_function_name
+  principal     = "apigateway.amazonaws.com"
+  source_arn    = "${aws_apigatewayv2_api.main.execution_arn}/*/*"
+}
+
 # API Stage
 resource "aws_apigatewayv2_stage" "main" {
   api_id      = aws_apigatewayv2_api.main.id
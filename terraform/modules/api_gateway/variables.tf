@@ -37,3 +37,19 @@ variable "get_credits_invoke_arn" {
 variable "get_credits_function_name" {
   type = string
 }
+
+variable "create_upload_url_invoke_arn" {
+  type = string
+}
+
+variable "create_upload_url_function_name" {
+  type = string
+}
+
+variable "manage_credits_invoke_arn" {
+  type = string
+}
+
+variable "manage_credits_function_name" {
+  type = string
+}
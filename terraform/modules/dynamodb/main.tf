@@ -62,12 +62,30 @@ resource "aws_dynamodb_table" "documents" {
     type = "S"
   }
 
+  attribute {
+    name = "hold_status"
+    type = "S"
+  }
+
+  attribute {
+    name = "expires_at"
+    type = "N"
+  }
+
   global_secondary_index {
     name            = "UserIdIndex"
     hash_key        = "user_id"
     projection_type = "ALL"
   }
 
+  # Sparse: only credit reservations still on hold carry hold_status
+  global_secondary_index {
+    name            = "ReservedHoldsIndex"
+    hash_key        = "hold_status"
+    range_key       = "expires_at"
+    projection_type = "ALL"
+  }
+
   tags = {
     Name        = "${var.project_name}-documents"
     Environment = var.environment
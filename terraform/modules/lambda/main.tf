@@ -50,10 +50,17 @@ resource "aws_iam_role_policy" "lambda_policy" {
         Effect = "Allow"
         Action = [
           "s3:GetObject",
-          "s3:PutObject"
+          "s3:PutObject",
+          "s3:DeleteObject"
         ]
         Resource = "arn:aws:s3:::${var.bucket_name}/*"
       },
+      {
+        # Without ListBucket, S3 reports a missing key as AccessDenied instead of NoSuchKey
+        Effect   = "Allow"
+        Action   = ["s3:ListBucket"]
+        Resource = "arn:aws:s3:::${var.bucket_name}"
+      },
       {
         Effect = "Allow"
         Action = [
@@ -76,16 +83,72 @@ resource "aws_lambda_function" "process_document" {
   timeout       = 300
   memory_size   = 3008
 
+  environment {
+    variables = {
+      USERS_TABLE       = var.users_table_name
+      USAGE_TABLE       = var.usage_table_name
+      DOCUMENTS_TABLE   = var.documents_table_name
+      BUCKET_NAME       = var.bucket_name
+      LLM_CACHE_BACKEND = "s3"
+    }
+  }
+}
+
+# Create Upload URL Lambda
+resource "aws_lambda_function" "create_upload_url" {
+  filename      = "${path.module}/../../lambda_functions/create_upload_url.zip"
+  function_name = "${var.project_name}-${var.environment}-create-upload-url"
+  role          = aws_iam_role.lambda_role.arn
+  handler       = "index.handler"
+  runtime       = "python3.11"
+  timeout       = 10
+  memory_size   = 256
+
+  environment {
+    variables = {
+      BUCKET_NAME = var.bucket_name
+    }
+  }
+}
+
+# Manage Credits Lambda
+resource "aws_lambda_function" "manage_credits" {
+  filename      = "${path.module}/../../lambda_functions/manage_credits.zip"
+  function_name = "${var.project_name}-${var.environment}-manage-credits"
+  role          = aws_iam_role.lambda_role.arn
+  handler       = "index.handler"
+  runtime       = "python3.11"
+  timeout       = 30
+  memory_size   = 256
+
   environment {
     variables = {
       USERS_TABLE     = var.users_table_name
       USAGE_TABLE     = var.usage_table_name
       DOCUMENTS_TABLE = var.documents_table_name
-      BUCKET_NAME     = var.bucket_name
     }
   }
 }
 
+# Return expired credit reservations on a schedule, off the reserve path
+resource "aws_cloudwatch_event_rule" "release_expired_reservations" {
+  name                = "${var.project_name}-${var.environment}-release-expired-reservations"
+  schedule_expression = "rate(5 minutes)"
+}
+
+resource "aws_cloudwatch_event_target" "release_expired_reservations" {
+  rule = aws_cloudwatch_event_rule.release_expired_reservations.name
+  arn  = aws_lambda_function.manage_credits.arn
+}
+
+resource "aws_lambda_permission" "release_expired_reservations" {
+  statement_id  = "AllowEventBridgeInvoke"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.manage_credits.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.release_expired_reservations.arn
+}
+
 # Register User Lambda
 resource "aws_lambda_function" "register_user" {
   filename      = "${path.module}/../../lambda_functions/register_user.zip"
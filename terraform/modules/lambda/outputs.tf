@@ -21,3 +21,19 @@ output "get_credits_invoke_arn" {
 output "get_credits_function_name" {
   value = aws_lambda_function.get_credits.function_name
 }
+
+output "create_upload_url_invoke_arn" {
+  value = aws_lambda_function.create_upload_url.invoke_arn
+}
+
+output "create_upload_url_function_name" {
+  value = aws_lambda_function.create_upload_url.function_name
+}
+
+output "manage_credits_invoke_arn" {
+  value = aws_lambda_function.manage_credits.invoke_arn
+}
+
+output "manage_credits_function_name" {
+  value = aws_lambda_function.manage_credits.function_name
+}
@@ -19,6 +19,21 @@ resource "aws_s3_bucket_lifecycle_configuration" "documents" {
       days = 30
     }
   }
+
+  # LLM extraction cache entries outlive LLM_CACHE_TTL_SECONDS (7 days) only until this rule runs
+  rule {
+    id     = "expire-llm-cache"
+    status = "Enabled"
+    filter {
+      prefix = "llm-cache/"
+    }
+    expiration {
+      days = 7
+    }
+    noncurrent_version_expiration {
+      noncurrent_days = 1
+    }
+  }
 }
 
 resource "aws_s3_bucket_cors_configuration" "documents" {
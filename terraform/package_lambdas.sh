@@ -23,5 +23,17 @@ cp process_document.py index.py
 zip process_document.zip index.py
 rm index.py
 
+# Package create_upload_url
+echo "Packaging create_upload_url..."
+cp create_upload_url.py index.py
+zip create_upload_url.zip index.py
+rm index.py
+
+# Package manage_credits
+echo "Packaging manage_credits..."
+cp manage_credits.py index.py
+zip manage_credits.zip index.py
+rm index.py
+
 echo "✅ All Lambda functions packaged!"
 ls -lh *.zip
@@ -0,0 +1,60 @@
+import unittest
+
+from metering import UsageMeter
+
+
+class StubTable:
+    """Stand-in usage table that records update_item calls"""
+
+    def __init__(self, on_update=None, fail_keys=()):
+        self.calls = []
+        self.on_update = on_update
+        self.fail_keys = set(fail_keys)
+
+    def update_item(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.on_update is not None:
+            self.on_update(kwargs)
+        if kwargs['Key']['api_key'] in self.fail_keys:
+            raise RuntimeError('throttled')
+
+
+class UsageMeterFlushTest(unittest.TestCase):
+    def test_flush_aliases_reserved_usage_attribute(self):
+        table = StubTable()
+        meter = UsageMeter(table, journal_path=None)
+        meter.record('key-a', 2)
+        meter.record('key-a', 3)
+
+        self.assertEqual(meter.flush(), 1)
+        self.assertEqual(len(table.calls), 1)
+        call = table.calls[0]
+        self.assertEqual(call['Key'], {'api_key': 'key-a'})
+        self.assertEqual(call['UpdateExpression'], 'SET #usage = #usage + :inc, last_used = :time')
+        self.assertEqual(call['ExpressionAttributeNames'], {'#usage': 'usage'})
+        self.assertEqual(call['ExpressionAttributeValues'][':inc'], 5)
+
+    def test_pending_includes_batch_being_flushed(self):
+        meter = UsageMeter(None, journal_path=None)
+        seen = []
+        meter.table = StubTable(on_update=lambda kwargs: seen.append(meter.pending('key-a')))
+        meter.record('key-a', 4)
+
+        meter.flush()
+        self.assertEqual(seen, [4])
+        self.assertEqual(meter.pending('key-a'), 0)
+
+    def test_failed_update_stays_pending(self):
+        table = StubTable(fail_keys={'key-b'})
+        meter = UsageMeter(table, journal_path=None)
+        meter.record('key-a', 1)
+        meter.record('key-b', 2)
+
+        self.assertEqual(meter.flush(), 1)
+        self.assertEqual(meter.pending('key-a'), 0)
+        self.assertEqual(meter.pending('key-b'), 2)
+        self.assertEqual(meter.metrics()['failed_writes'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
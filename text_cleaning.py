@@ -0,0 +1,117 @@
+import copy
+import re
+from typing import Any, Dict, List
+
+from unstructured.cleaners.core import clean_bullets, clean_extra_whitespace, clean_non_ascii_chars
+from unstructured.nlp.patterns import UNICODE_BULLETS_RE
+
+# Element texts are joined on NUL so each cleaning pass runs once over one buffer
+SEPARATOR = '\x00'
+# Marks texts whose leading bullet matched, so they can be stripped without a regex callback
+BULLET_MARKER = '\x01'
+
+# Patterns lead with a literal so the engine can skip ahead instead of trying every position
+_MULTI_SPACE_RE = re.compile(r"  +")
+_LEADING_BULLET_RE = re.compile(r"\x00(?:" + UNICODE_BULLETS_RE.pattern + r")")
+
+
+def _with_text(element, text: str):
+    """Shallow-copy an element with new text, so the held raw partition output stays untouched"""
+    if not hasattr(element, '__dict__'):
+        clone = copy.copy(element)
+    else:
+        clone = object.__new__(type(element))
+        clone.__dict__.update(element.__dict__)
+    clone.text = text
+    return clone
+
+
+def iter_clean_elements(elements, processing_options: Dict[str, Any]):
+    """Apply text cleaning and the minimum length filter lazily, one element at a time"""
+    for element in elements:
+        if hasattr(element, 'text') and element.text:
+            text = element.text
+
+            # Basic cleaning
+            if processing_options.get('clean_text', False):
+                text = clean_extra_whitespace(text)
+
+            if processing_options.get('clean_non_ascii', False):
+                text = clean_non_ascii_chars(text)
+
+            if processing_options.get('clean_bullets', False):
+                text = clean_bullets(text)
+
+            # Filter by minimum text length
+            min_length = processing_options.get('min_text_length', 0)
+            if len(text.strip()) >= min_length:
+                if text != element.text:
+                    element = _with_text(element, text)
+                yield element
+        else:
+            yield element
+
+
+def clean_texts(texts: List[str], clean_text: bool = False, clean_non_ascii: bool = False,
+                clean_bullets_: bool = False) -> List[str]:
+    """Clean a batch of texts with the same results as the per-text unstructured cleaners"""
+    if not texts or not (clean_text or clean_non_ascii or clean_bullets_):
+        return list(texts)
+
+    buffer = SEPARATOR.join(texts)
+
+    # Texts that already contain a control marker can't be split back apart safely
+    if buffer.count(SEPARATOR) != len(texts) - 1 or BULLET_MARKER in buffer:
+        cleaned = []
+        for text in texts:
+            if clean_text:
+                text = clean_extra_whitespace(text)
+            if clean_non_ascii:
+                text = clean_non_ascii_chars(text)
+            if clean_bullets_:
+                text = clean_bullets(text)
+            cleaned.append(text)
+        return cleaned
+
+    if clean_text:
+        buffer = _MULTI_SPACE_RE.sub(' ', buffer.replace('\xa0', ' ').replace('\n', ' '))
+        buffer = SEPARATOR.join([text.strip() for text in buffer.split(SEPARATOR)])
+
+    if clean_non_ascii:
+        buffer = buffer.encode("ascii", "ignore").decode()
+
+    if clean_bullets_:
+        # A leading separator lets the first text match the same pattern as the rest
+        buffer = _LEADING_BULLET_RE.sub(SEPARATOR + BULLET_MARKER, SEPARATOR + buffer)[1:]
+        return [
+            text[1:].strip() if text[:1] == BULLET_MARKER else text
+            for text in buffer.split(SEPARATOR)
+        ]
+
+    return buffer.split(SEPARATOR)
+
+
+def clean_elements_batch(elements, processing_options: Dict[str, Any]) -> List:
+    """Batched equivalent of iter_clean_elements over a whole element list"""
+    elements = list(elements)
+    positions = [idx for idx, element in enumerate(elements) if getattr(element, 'text', None)]
+    original_texts = [elements[idx].text for idx in positions]
+
+    cleaned_texts = clean_texts(
+        original_texts,
+        clean_text=processing_options.get('clean_text', False),
+        clean_non_ascii=processing_options.get('clean_non_ascii', False),
+        clean_bullets_=processing_options.get('clean_bullets', False),
+    )
+
+    min_length = processing_options.get('min_text_length', 0)
+    dropped = set()
+    for idx, original, text in zip(positions, original_texts, cleaned_texts):
+        if len(text.strip()) < min_length:
+            dropped.add(idx)
+        elif text != original:
+            elements[idx] = _with_text(elements[idx], text)
+
+    if not dropped:
+        return elements
+    return [element for idx, element in enumerate(elements) if idx not in dropped]